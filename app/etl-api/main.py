@@ -1,4 +1,4 @@
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 import os
 import hashlib
 import time
@@ -19,9 +19,10 @@ except Exception:  # pragma: no cover
 
 try:
     # Celery is optional in local dev without worker
-    from app.worker.tasks import ingest_from_webhook  # type: ignore
+    from app.worker.tasks import ingest_from_webhook, ingest_batch  # type: ignore
 except Exception:  # pragma: no cover
     ingest_from_webhook = None  # type: ignore
+    ingest_batch = None  # type: ignore
 
 
 class WebhookEvent(BaseModel):
@@ -34,6 +35,10 @@ class WebhookEvent(BaseModel):
     meta: Optional[Dict[str, Any]] = None
 
 
+class BulkIngestRequest(BaseModel):
+    events: List[WebhookEvent]
+
+
 app = FastAPI(title="etl-api", version="0.1.0")
 
 STORAGE_DIR = os.getenv("STORAGE_DIR", "/data/storage")
@@ -111,6 +116,35 @@ async def ingest_webhook(event: WebhookEvent) -> Dict[str, Any]:
     return await webhook(event)
 
 
+@app.post("/ingest/bulk")
+async def ingest_bulk(req: BulkIngestRequest) -> Dict[str, Any]:
+    """Queue many events at once; the worker embeds/indexes each batch together.
+
+    All events of one post go to the same batch (in their original order), so
+    the worker's last-event-wins handling never races a sibling batch. A post
+    with more than INGEST_BULK_BATCH events still gets a single batch.
+    """
+    if not req.events:
+        raise HTTPException(status_code=400, detail="events must not be empty")
+    payloads = [e.model_dump() for e in req.events]
+    size = max(1, int(os.getenv("INGEST_BULK_BATCH", "64")))
+    by_post: Dict[str, List[Dict[str, Any]]] = {}
+    for p in payloads:
+        by_post.setdefault(str(p.get("post_id")), []).append(p)
+    batches: List[List[Dict[str, Any]]] = []
+    for group in by_post.values():
+        if not batches or len(batches[-1]) + len(group) > size:
+            batches.append([])
+        batches[-1].extend(group)
+    tasks: List[Dict[str, Any]] = []
+    for batch in batches:
+        task_id = None
+        if ingest_batch:
+            task_id = ingest_batch.delay(batch).id  # type: ignore
+        tasks.append({"task_id": task_id, "post_ids": [p.get("post_id") for p in batch]})
+    return {"status": "accepted" if ingest_batch else "worker_unavailable", "events": len(payloads), "batches": tasks}
+
+
 def _sha1_fileobj(fobj) -> str:
     h = hashlib.sha1()
     while True:
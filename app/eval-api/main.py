@@ -47,6 +47,16 @@ def _read_jsonl(path: str) -> List[Dict[str, Any]]:
     return out
 
 
+def _dataset_path(dataset: str) -> str:
+    if dataset == "master":
+        return os.path.join(_datasets_root(), "master", "voice_phishing_master_ko.jsonl")
+    if dataset == "refusal":
+        return os.path.join(_datasets_root(), "refusal", "refusal_ko.jsonl")
+    if dataset == "pii":
+        return os.path.join(_datasets_root(), "pii", "pii_exposure_ko.jsonl")
+    return os.path.join(_datasets_root(), dataset)
+
+
 def _maybe_call_rag(question: str) -> Dict[str, Any]:
     base = os.getenv("RAG_API_BASE")
     if not base:
@@ -78,17 +88,7 @@ def run_eval(req: EvalRunRequest) -> EvalRunResponse:
     ts = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
     path = os.path.join(_reports_dir(), f"metrics_{req.dataset}_{ts}.json")
 
-    # Load dataset
-    if req.dataset == "master":
-        dpath = os.path.join(_datasets_root(), "master", "voice_phishing_master_ko.jsonl")
-    elif req.dataset == "refusal":
-        dpath = os.path.join(_datasets_root(), "refusal", "refusal_ko.jsonl")
-    elif req.dataset == "pii":
-        dpath = os.path.join(_datasets_root(), "pii", "pii_exposure_ko.jsonl")
-    else:
-        dpath = os.path.join(_datasets_root(), req.dataset)
-
-    items = _read_jsonl(dpath)
+    items = _read_jsonl(_dataset_path(req.dataset))
 
     results: List[Dict[str, Any]] = []
     for s in items:
@@ -148,6 +148,104 @@ def run_eval(req: EvalRunRequest) -> EvalRunResponse:
     return EvalRunResponse(job_id=job_id, status="completed")
 
 
+# Rerank budget profiles compared against a full cross-encoder pass ("full").
+# Keys match app.models.reranker._settings; the score cache is off so latencies are cold.
+_DEFAULT_RERANK_PROFILES: Dict[str, Dict[str, Any]] = {
+    "depth_20": {"depth": 20},
+    "cascade_16": {"cascade_band": 16},
+    "skip_gap_0.3": {"skip_gap": 0.3},
+    "budget_50ms": {"budget_ms": 50, "batch": 8},
+}
+
+
+class RerankTradeoffRequest(BaseModel):
+    dataset: str = "master"
+    top_k: int = 8
+    limit: int = 50
+    profiles: Dict[str, Dict[str, Any]] | None = None
+
+
+def _debug_search(question: str, top_k: int, rerank: Dict[str, Any]) -> Dict[str, Any] | None:
+    base = os.getenv("RAG_API_BASE")
+    if not base:
+        return None
+    try:
+        import httpx
+
+        r = httpx.post(
+            base.rstrip("/") + "/debug/search",
+            json={"query": question, "top_k": top_k, "rerank": {**rerank, "use_cache": 0}},
+            timeout=60.0,
+        )
+        r.raise_for_status()
+        data = r.json()
+        timings = data.get("timings", {})
+        return {
+            "ids": [h.get("id") for h in data.get("hits", [])],
+            "rerank_ms": float(timings.get("rerank_ms", 0.0)),
+            "rerank": timings.get("rerank", {}),
+        }
+    except Exception:
+        return None
+
+
+def _p95(xs: List[float]) -> float:
+    if not xs:
+        return 0.0
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(round(0.95 * (len(xs) - 1))))]
+
+
+@app.post("/eval/rerank-tradeoff")
+def rerank_tradeoff(req: RerankTradeoffRequest) -> Dict[str, Any]:
+    """Compare rerank budget profiles with a full CE rerank on the dataset questions.
+
+    Quality is agreement with the full run on the returned hits (overlap and
+    top-1 match); cost is rerank latency and how many pairs the CE scored.
+    """
+    profiles = {"full": {"skip_gap": 0, "cascade_band": 0, "budget_ms": 0}, **(req.profiles or _DEFAULT_RERANK_PROFILES)}
+    questions = [s.get("question", "") for s in _read_jsonl(_dataset_path(req.dataset))]
+    questions = [q for q in questions if q][: req.limit]
+
+    runs: Dict[str, List[Dict[str, Any] | None]] = {name: [] for name in profiles}
+    for q in questions:
+        for name, opts in profiles.items():
+            runs[name].append(_debug_search(q, req.top_k, opts))
+
+    summary: Dict[str, Any] = {}
+    for name in profiles:
+        lat, scored, overlap, top1, skipped = [], [], [], [], 0
+        for ref, got in zip(runs["full"], runs[name]):
+            if not ref or not got:
+                continue
+            lat.append(got["rerank_ms"])
+            scored.append(float(got["rerank"].get("ce_scored", 0)))
+            skipped += 1 if got["rerank"].get("mode") == "skip_gap" else 0
+            if ref["ids"]:
+                overlap.append(len(set(ref["ids"]) & set(got["ids"])) / len(ref["ids"]))
+                top1.append(1.0 if got["ids"][:1] == ref["ids"][:1] else 0.0)
+        n = len(lat)
+        summary[name] = {
+            "options": profiles[name],
+            "queries": n,
+            "avg_rerank_ms": round(sum(lat) / n, 1) if n else 0.0,
+            "p95_rerank_ms": round(_p95(lat), 1),
+            "avg_ce_scored": round(sum(scored) / n, 1) if n else 0.0,
+            "skip_rate": round(skipped / n, 3) if n else 0.0,
+            "overlap_vs_full": round(sum(overlap) / len(overlap), 3) if overlap else 0.0,
+            "top1_agreement": round(sum(top1) / len(top1), 3) if top1 else 0.0,
+        }
+
+    report = {"dataset": req.dataset, "top_k": req.top_k, "summary": summary, "created_at": datetime.utcnow().isoformat()}
+    # Kept in a subdirectory so the answer-quality report listing is unaffected
+    out_dir = os.path.join(_reports_dir(), "rerank")
+    os.makedirs(out_dir, exist_ok=True)
+    ts = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+    with open(os.path.join(out_dir, f"rerank_{req.dataset}_{ts}.json"), "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return report
+
+
 class JudgeEvalRequest(BaseModel):
     question: str
     answer: str
@@ -1,23 +1,59 @@
-from typing import Dict, Any
+from typing import Any, Dict, Optional, Set
 import os
+import threading
+
+
+_client_obj: Any = None
+_client_pid: Optional[int] = None
+_ensured: Set[str] = set()
+_lock = threading.Lock()
+
+
+def get_client() -> Any:
+    """Process-wide OpenSearch client with a pooled, keep-alive connection.
+
+    Pool size, timeout and retries come from OPENSEARCH_POOL_MAXSIZE,
+    OPENSEARCH_TIMEOUT and OPENSEARCH_MAX_RETRIES. Rebuilt after fork.
+    """
+    global _client_obj, _client_pid
+    with _lock:
+        if _client_obj is not None and _client_pid == os.getpid():
+            return _client_obj
+        try:
+            from opensearchpy import OpenSearch  # type: ignore
+        except Exception as e:  # pragma: no cover
+            raise RuntimeError("opensearch-py not installed") from e
+        url = os.getenv("OPENSEARCH_URL", "http://opensearch:9200")
+        user = os.getenv("OPENSEARCH_USER")
+        password = os.getenv("OPENSEARCH_PASSWORD")
+        http_auth = (user, password) if user and password else None
+        _client_obj = OpenSearch(
+            hosts=[url],
+            http_auth=http_auth,
+            verify_certs=False,
+            ssl_show_warn=False,
+            pool_maxsize=int(os.getenv("OPENSEARCH_POOL_MAXSIZE", "16")),
+            timeout=float(os.getenv("OPENSEARCH_TIMEOUT", "10")),
+            max_retries=int(os.getenv("OPENSEARCH_MAX_RETRIES", "3")),
+            retry_on_timeout=True,
+        )
+        _client_pid = os.getpid()
+        _ensured.clear()
+        return _client_obj
 
 
 def _client():
-    try:
-        from opensearchpy import OpenSearch  # type: ignore
-    except Exception as e:  # pragma: no cover
-        raise RuntimeError("opensearch-py not installed") from e
-    url = os.getenv("OPENSEARCH_URL", "http://opensearch:9200")
-    user = os.getenv("OPENSEARCH_USER")
-    password = os.getenv("OPENSEARCH_PASSWORD")
-    http_auth = (user, password) if user and password else None
-    return OpenSearch(hosts=[url], http_auth=http_auth, verify_certs=False, ssl_show_warn=False)
+    return get_client()
 
 
-def ensure_index(index: str = "posts") -> None:
+def ensure_index(index: str = "posts", force: bool = False) -> None:
+    """Create the index if missing; checked once per process unless ``force``."""
     cli = _client()
+    if index in _ensured and not force:
+        return
     try:
         if cli.indices.exists(index=index):  # type: ignore
+            _ensured.add(index)
             return
     except Exception:
         pass
@@ -76,6 +112,7 @@ def ensure_index(index: str = "posts") -> None:
     }
     try:
         cli.indices.create(index=index, body=body)  # type: ignore
+        _ensured.add(index)
     except Exception:
         # Fallback without synonyms if creation failed (e.g., synonyms set missing)
         body["settings"]["analysis"] = {
@@ -93,6 +130,7 @@ def ensure_index(index: str = "posts") -> None:
         body["mappings"]["properties"]["body"]["search_analyzer"] = "ko_analyzer"
         try:
             cli.indices.create(index=index, body=body)  # type: ignore
+            _ensured.add(index)
         except Exception:
             pass
 
@@ -44,10 +44,11 @@ def upsert_embeddings(collection: str, points: List[Dict[str, Any]], dim: int =
         return
     ensure_collection(collection, dim)
     client = _client()
+    # Vectors stay float32 arrays upstream; PointStruct needs lists (REST/JSON boundary)
     qpoints = [
         PointStruct(
             id=p.get("id"),
-            vector=p["vector"],
+            vector=p["vector"].tolist() if hasattr(p["vector"], "tolist") else p["vector"],
             payload={k: v for k, v in p.items() if k not in {"id", "vector"}},
         )
         for p in points
@@ -55,6 +56,48 @@ def upsert_embeddings(collection: str, points: List[Dict[str, Any]], dim: int =
     client.upsert(collection_name=collection, points=qpoints)
 
 
+def scroll_post_points(collection: str, post_id: str) -> Dict[str, Dict[str, Any]]:
+    """Return {point_id: payload} for every chunk of a post (vectors not fetched)."""
+    from qdrant_client.http.models import Filter, FieldCondition, MatchValue  # type: ignore
+
+    client = _client()
+    flt = Filter(must=[FieldCondition(key="post_id", match=MatchValue(value=post_id))])
+    out: Dict[str, Dict[str, Any]] = {}
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection,
+            scroll_filter=flt,
+            limit=256,
+            offset=offset,
+            with_payload=True,
+            with_vectors=False,
+        )
+        for p in points:
+            out[str(p.id)] = dict(p.payload or {})
+        if offset is None:
+            break
+    return out
+
+
+def retrieve_vectors(collection: str, ids: List[str]) -> Dict[str, Any]:
+    """Fetch stored vectors by point id (used to rewrite payloads without re-embedding)."""
+    if not ids:
+        return {}
+    client = _client()
+    res = client.retrieve(collection_name=collection, ids=ids, with_payload=False, with_vectors=True)
+    return {str(p.id): p.vector for p in res}
+
+
+def delete_points(collection: str, ids: List[str]) -> None:
+    if not ids:
+        return
+    from qdrant_client.http.models import PointIdsList  # type: ignore
+
+    client = _client()
+    client.delete(collection_name=collection, points_selector=PointIdsList(points=ids))
+
+
 def delete_by_post_id(collection: str, post_id: str) -> None:
     client = _client()
     try:
@@ -1,61 +1,212 @@
 import os
 import sqlite3
-from typing import Optional, List, Dict, Any
+import threading
+from contextlib import contextmanager
+from typing import Optional, List, Dict, Any, Iterator, Tuple
+
+
+_SCHEMA = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS posts USING fts5(
+        title, body, tags, category, filetype, posted_at, severity
+    );
+    """,
+    # Map FTS rowid -> external post_id
+    """
+    CREATE TABLE IF NOT EXISTS fts_row_map(
+        rowid INTEGER PRIMARY KEY,
+        post_id TEXT
+    );
+    """,
+    # Meta tables
+    """
+    CREATE TABLE IF NOT EXISTS attachments(
+        post_id TEXT,
+        filename TEXT,
+        sha1 TEXT
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS post_meta(
+        post_id TEXT PRIMARY KEY,
+        title TEXT,
+        category TEXT,
+        posted_at TEXT,
+        severity TEXT
+    );
+    """,
+)
 
 
 def _ensure_dir(path: str) -> None:
     os.makedirs(os.path.dirname(path), exist_ok=True)
 
 
+class IndexSession:
+    """Process-wide writer for one SQLite IR database.
+
+    Holds a single WAL-mode connection and creates the schema once, on first
+    use. Writes issued inside ``transaction()`` share one commit; calls made
+    outside of it run in their own short transaction. Like the search readers,
+    the connection is reopened when the DB file is deleted or replaced
+    (device/inode change), so writes never go to an unlinked file.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._file: Optional[Tuple[int, int]] = None
+        self._depth = 0
+        self._lock = threading.RLock()
+
+    def _file_id(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.db_path)
+        except OSError:
+            return None
+        return st.st_dev, st.st_ino
+
+    def _connect(self) -> sqlite3.Connection:
+        # Reopen after fork (e.g. Celery prefork children) instead of sharing the parent's handle
+        if self._conn is not None and self._pid == os.getpid():
+            # Never swap the handle mid-transaction; otherwise check the file is still ours
+            if self._depth > 0 or self._file_id() == self._file:
+                return self._conn
+            self.close()
+        _ensure_dir(self.db_path)
+        conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))}")
+        conn.execute("BEGIN")
+        try:
+            for ddl in _SCHEMA:
+                conn.execute(ddl)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            conn.close()
+            raise
+        self._conn = conn
+        self._pid = os.getpid()
+        self._file = self._file_id()
+        self._depth = 0
+        return conn
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    self._conn.close()
+                except Exception:
+                    pass
+            self._conn = None
+            self._file = None
+            self._depth = 0
+
+    @contextmanager
+    def transaction(self) -> Iterator["IndexSession"]:
+        """Group several writes into a single transaction (re-entrant)."""
+        with self._lock:
+            conn = self._connect()
+            if self._depth == 0:
+                conn.execute("BEGIN IMMEDIATE")
+            self._depth += 1
+            try:
+                yield self
+            except BaseException:
+                self._depth -= 1
+                if self._depth == 0:
+                    conn.execute("ROLLBACK")
+                raise
+            self._depth -= 1
+            if self._depth == 0:
+                conn.execute("COMMIT")
+
+    def index_post(
+        self,
+        *,
+        post_id: str,
+        title: str,
+        body: str,
+        tags: str = "",
+        category: str = "",
+        filetype: str = "",
+        posted_at: Optional[str] = None,
+        severity: Optional[str] = None,
+    ) -> None:
+        with self.transaction():
+            cur = self._conn.cursor()  # type: ignore[union-attr]
+            cur.execute(
+                "INSERT INTO posts(title, body, tags, category, filetype, posted_at, severity) VALUES(?,?,?,?,?,?,?)",
+                (title, body, tags, category, filetype, posted_at or "", severity or ""),
+            )
+            rid = cur.lastrowid
+            if rid is not None:
+                cur.execute(
+                    "REPLACE INTO fts_row_map(rowid, post_id) VALUES(?,?)",
+                    (rid, post_id),
+                )
+
+    def save_post_meta(self, *, post_id: str, title: str, category: str = "", posted_at: str = "", severity: str = "") -> None:
+        with self.transaction():
+            self._conn.execute(  # type: ignore[union-attr]
+                "REPLACE INTO post_meta(post_id, title, category, posted_at, severity) VALUES(?,?,?,?,?)",
+                (post_id, title, category, posted_at, severity),
+            )
+
+    def save_attachments(self, *, post_id: str, items: List[Dict[str, Any]]) -> None:
+        with self.transaction():
+            self._conn.executemany(  # type: ignore[union-attr]
+                "INSERT INTO attachments(post_id, filename, sha1) VALUES(?,?,?)",
+                [(post_id, it.get("filename", ""), it.get("sha1", "")) for it in items],
+            )
+
+    def list_attachments(self, *, post_id: str) -> List[Dict[str, Any]]:
+        # Plain read: no write lock needed
+        with self._lock:
+            cur = self._connect().execute("SELECT filename, sha1 FROM attachments WHERE post_id=?", (post_id,))
+            return [{"filename": r["filename"], "sha1": r["sha1"]} for r in cur.fetchall()]
+
+    def delete_post(self, *, post_id: str) -> None:
+        with self.transaction():
+            cur = self._conn.cursor()  # type: ignore[union-attr]
+            # Find rowids mapped to this post_id
+            cur.execute("SELECT rowid FROM fts_row_map WHERE post_id=?", (post_id,))
+            rowids = [r[0] for r in cur.fetchall()]
+            if rowids:
+                cur.executemany("DELETE FROM posts WHERE rowid=?", [(rid,) for rid in rowids])
+                cur.executemany("DELETE FROM fts_row_map WHERE rowid=?", [(rid,) for rid in rowids])
+            # Cleanup meta and attachments
+            cur.execute("DELETE FROM attachments WHERE post_id=?", (post_id,))
+            cur.execute("DELETE FROM post_meta WHERE post_id=?", (post_id,))
+
+
+_sessions: Dict[str, IndexSession] = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(db_path: str) -> IndexSession:
+    """Return the shared writer session for ``db_path``."""
+    with _sessions_lock:
+        sess = _sessions.get(db_path)
+        if sess is None:
+            sess = IndexSession(db_path)
+            _sessions[db_path] = sess
+        return sess
+
+
 def ensure_fts5(db_path: str) -> None:
     """Ensure an FTS5 table for posts exists (MVP schema).
 
     Columns: title, body, tags, category, filetype, posted_at, severity
+    The schema is created once per process when the writer session connects.
     """
-    _ensure_dir(db_path)
-    conn = sqlite3.connect(db_path)
-    try:
-        cur = conn.cursor()
-        cur.execute(
-            """
-            CREATE VIRTUAL TABLE IF NOT EXISTS posts USING fts5(
-                title, body, tags, category, filetype, posted_at, severity
-            );
-            """
-        )
-        # Map FTS rowid -> external post_id
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS fts_row_map(
-                rowid INTEGER PRIMARY KEY,
-                post_id TEXT
-            );
-            """
-        )
-        # Meta tables
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS attachments(
-                post_id TEXT,
-                filename TEXT,
-                sha1 TEXT
-            );
-            """
-        )
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS post_meta(
-                post_id TEXT PRIMARY KEY,
-                title TEXT,
-                category TEXT,
-                posted_at TEXT,
-                severity TEXT
-            );
-            """
-        )
-        conn.commit()
-    finally:
-        conn.close()
+    sess = get_session(db_path)
+    with sess._lock:
+        sess._connect()
 
 
 def index_post(
@@ -71,79 +222,29 @@ def index_post(
     severity: Optional[str] = None,
 ) -> None:
     """Insert a post row into FTS5 index."""
-    ensure_fts5(db_path)
-    conn = sqlite3.connect(db_path)
-    try:
-        cur = conn.cursor()
-        cur.execute(
-            "INSERT INTO posts(title, body, tags, category, filetype, posted_at, severity) VALUES(?,?,?,?,?,?,?)",
-            (title, body, tags, category, filetype, posted_at or "", severity or ""),
-        )
-        rid = cur.lastrowid
-        if rid is not None:
-            cur.execute(
-                "REPLACE INTO fts_row_map(rowid, post_id) VALUES(?,?)",
-                (rid, post_id),
-            )
-        conn.commit()
-    finally:
-        conn.close()
+    get_session(db_path).index_post(
+        post_id=post_id,
+        title=title,
+        body=body,
+        tags=tags,
+        category=category,
+        filetype=filetype,
+        posted_at=posted_at,
+        severity=severity,
+    )
 
 
 def save_post_meta(db_path: str, *, post_id: str, title: str, category: str = "", posted_at: str = "", severity: str = "") -> None:
-    ensure_fts5(db_path)
-    conn = sqlite3.connect(db_path)
-    try:
-        cur = conn.cursor()
-        cur.execute(
-            "REPLACE INTO post_meta(post_id, title, category, posted_at, severity) VALUES(?,?,?,?,?)",
-            (post_id, title, category, posted_at, severity),
-        )
-        conn.commit()
-    finally:
-        conn.close()
+    get_session(db_path).save_post_meta(post_id=post_id, title=title, category=category, posted_at=posted_at, severity=severity)
 
 
 def save_attachments(db_path: str, *, post_id: str, items: List[Dict[str, Any]]) -> None:
-    ensure_fts5(db_path)
-    conn = sqlite3.connect(db_path)
-    try:
-        cur = conn.cursor()
-        cur.executemany(
-            "INSERT INTO attachments(post_id, filename, sha1) VALUES(?,?,?)",
-            [(post_id, it.get("filename", ""), it.get("sha1", "")) for it in items],
-        )
-        conn.commit()
-    finally:
-        conn.close()
+    get_session(db_path).save_attachments(post_id=post_id, items=items)
 
 
 def list_attachments(db_path: str, *, post_id: str) -> List[Dict[str, Any]]:
-    ensure_fts5(db_path)
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    try:
-        cur = conn.cursor()
-        cur.execute("SELECT filename, sha1 FROM attachments WHERE post_id=?", (post_id,))
-        return [{"filename": r["filename"], "sha1": r["sha1"]} for r in cur.fetchall()]
-    finally:
-        conn.close()
+    return get_session(db_path).list_attachments(post_id=post_id)
 
 
 def delete_post(db_path: str, *, post_id: str) -> None:
-    ensure_fts5(db_path)
-    conn = sqlite3.connect(db_path)
-    try:
-        cur = conn.cursor()
-        # Find rowids mapped to this post_id
-        cur.execute("SELECT rowid FROM fts_row_map WHERE post_id=?", (post_id,))
-        rowids = [r[0] for r in cur.fetchall()]
-        if rowids:
-            cur.executemany("DELETE FROM posts WHERE rowid=?", [(rid,) for rid in rowids])
-            cur.executemany("DELETE FROM fts_row_map WHERE rowid=?", [(rid,) for rid in rowids])
-        # Cleanup meta and attachments
-        cur.execute("DELETE FROM attachments WHERE post_id=?", (post_id,))
-        cur.execute("DELETE FROM post_meta WHERE post_id=?", (post_id,))
-        conn.commit()
-    finally:
-        conn.close()
+    get_session(db_path).delete_post(post_id=post_id)
@@ -1,38 +1,247 @@
 import os
 import hashlib
 import json
-from typing import List, Callable, Optional
+import logging
+import queue
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Any, Dict, List, Callable, Optional, Tuple
 
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
 
 _st_model = None
+_ort_session = None
+_ort_model_id: Optional[str] = None  # "<model path>[:int8]" actually loaded into _ort_session
+_tokenizer = None
 _redis = None
+# Guards model/session construction (and int8 quantization) against concurrent first calls
+_load_lock = threading.Lock()
+
+# In-process LRU tier in front of Redis: _hash_key -> packed float32 bytes
+_lru: "OrderedDict[str, bytes]" = OrderedDict()
+_lru_lock = threading.Lock()
+
+# Query micro-batching metrics (exported by services that expose prometheus /metrics)
+try:
+    from prometheus_client import Histogram
+
+    _QUERY_BATCH_SIZE = Histogram(  # type: ignore
+        "embed_query_batch_size", "Queries per coalesced embedding pass", buckets=(1, 2, 4, 8, 16, 32, 64)
+    )
+    _QUERY_QUEUE_WAIT = Histogram(  # type: ignore
+        "embed_query_queue_wait_seconds",
+        "Time a query waited in the micro-batch queue",
+        buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25),
+    )
+except Exception:  # pragma: no cover
+    _QUERY_BATCH_SIZE = None
+    _QUERY_QUEUE_WAIT = None
+
+
+def _zeros(n: int, dim: int = 1024) -> np.ndarray:
+    return np.zeros((n, dim), dtype=np.float32)
+
+
+def _max_length() -> int:
+    return int(os.getenv("EMBED_MAX_LENGTH", "512"))
 
 
-def _try_load_st() -> Callable[[List[str]], List[List[float]]]:
+def _token_lengths(tok: Any, texts: List[str]) -> List[int]:
+    """Truncated token counts per text; falls back to character length without a tokenizer."""
+    if tok is None:
+        return [min(len(t), _max_length()) for t in texts]
+    try:
+        ids = tok(texts, add_special_tokens=True, truncation=True, max_length=_max_length())["input_ids"]
+        return [len(x) for x in ids]
+    except Exception:
+        return [min(len(t), _max_length()) for t in texts]
+
+
+def _plan_buckets(lengths: List[int]) -> List[List[int]]:
+    """Group text indices into length-sorted batches sized by a padded-token budget.
+
+    Each batch pads to its longest member, so sorting keeps padding low and the
+    budget (EMBED_TOKEN_BUDGET, default EMBED_BATCH * EMBED_MAX_LENGTH) lets short
+    chunks run in much larger batches than long ones. Indices refer to the input
+    order so callers can scatter results back.
+    """
+    max_batch = int(os.getenv("EMBED_MAX_BATCH", "256"))
+    budget = int(os.getenv("EMBED_TOKEN_BUDGET", str(int(os.getenv("EMBED_BATCH", "32")) * _max_length())))
+    buckets: List[List[int]] = []
+    cur: List[int] = []
+    for i in sorted(range(len(lengths)), key=lambda j: lengths[j]):
+        # Ascending order: the new item is the longest, so it sets the padded width
+        if cur and ((len(cur) + 1) * max(1, lengths[i]) > budget or len(cur) >= max_batch):
+            buckets.append(cur)
+            cur = []
+        cur.append(i)
+    if cur:
+        buckets.append(cur)
+    return buckets
+
+
+def _try_load_st() -> Optional[Callable[[List[str]], np.ndarray]]:
     global _st_model
     try:
         from sentence_transformers import SentenceTransformer
-        import numpy as np
     except Exception:  # pragma: no cover
-        return lambda texts: [[0.0] * 1024 for _ in texts]
+        return None
 
     model_name = os.getenv(
         "EMBEDDING_MODEL", "dragonkue/snowflake-arctic-embed-l-v2.0-ko"
     )
     if _st_model is None:
-        _st_model = SentenceTransformer(model_name)
+        with _load_lock:
+            if _st_model is None:
+                _st_model = SentenceTransformer(model_name)
+
+    def _embed(texts: List[str]) -> np.ndarray:
+        vecs = np.empty((len(texts), _st_model.get_sentence_embedding_dimension()), dtype=np.float32)
+        lengths = _token_lengths(getattr(_st_model, "tokenizer", None), texts)
+        for idx in _plan_buckets(lengths):
+            vecs[idx] = _st_model.encode(
+                [texts[i] for i in idx], batch_size=len(idx), convert_to_numpy=True
+            )
+        # L2 normalize (in place, stays a contiguous float32 matrix)
+        vecs /= np.linalg.norm(vecs, axis=1, keepdims=True) + 1e-12
+        return vecs
+
+    return _embed
 
-    def _embed(texts: List[str]) -> List[List[float]]:
-        vecs = _st_model.encode(texts, batch_size=int(os.getenv("EMBED_BATCH", "32")))
-        # L2 normalize
-        import numpy as np
 
-        vecs = vecs / (np.linalg.norm(vecs, axis=1, keepdims=True) + 1e-12)
-        return vecs.tolist()
+def _backend() -> str:
+    """st | onnx | none. USE_ST=1 keeps selecting the ST backend when EMBED_BACKEND is unset."""
+    default = "st" if os.getenv("USE_ST", "0") == "1" else "none"
+    return os.getenv("EMBED_BACKEND", default).lower()
+
+
+def _quantize_int8(model_path: str) -> str:
+    """Dynamically quantize weights to int8 once, next to the fp32 model."""
+    quant_path = os.getenv("EMBEDDING_ONNX_INT8_PATH") or model_path.replace(".onnx", ".int8.onnx")
+    if os.path.exists(quant_path):
+        return quant_path
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    # Write aside and rename, so other processes never load a half-written model
+    tmp_path = f"{quant_path}.{os.getpid()}.tmp"
+    quantize_dynamic(model_path, tmp_path, weight_type=QuantType.QInt8)
+    os.replace(tmp_path, quant_path)
+    return quant_path
+
+
+def _onnx_session() -> Any:
+    global _ort_session, _ort_model_id
+    if _ort_session is not None:
+        return _ort_session
+    try:
+        import onnxruntime as ort
+    except Exception:  # pragma: no cover
+        return None
+    model_path = os.getenv("EMBEDDING_ONNX_PATH")
+    if not model_path or not os.path.exists(model_path):
+        return None
+    with _load_lock:
+        if _ort_session is None:
+            model_id = model_path
+            if os.getenv("EMBED_ONNX_QUANTIZE", "0") == "1":
+                try:
+                    model_path = _quantize_int8(model_path)
+                    model_id = f"{model_path}:int8"
+                except Exception as e:
+                    logger.warning("int8 quantization of %s failed, using the fp32 model: %r", model_path, e)
+            opts = ort.SessionOptions()
+            opts.intra_op_num_threads = int(os.getenv("EMBED_ONNX_THREADS", "0"))  # 0 = ORT default
+            opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            _ort_session = ort.InferenceSession(model_path, sess_options=opts, providers=["CPUExecutionProvider"])
+            _ort_model_id = model_id
+    return _ort_session
+
+
+def _onnx_tokenizer():
+    global _tokenizer
+    if _tokenizer is not None:
+        return _tokenizer
+    try:
+        from transformers import AutoTokenizer
+    except Exception:  # pragma: no cover
+        return None
+    tok_name = os.getenv("EMBED_TOKENIZER") or os.getenv(
+        "EMBEDDING_MODEL", "dragonkue/snowflake-arctic-embed-l-v2.0-ko"
+    )
+    with _load_lock:
+        if _tokenizer is None:
+            _tokenizer = AutoTokenizer.from_pretrained(tok_name)
+    return _tokenizer
+
+
+def _try_load_onnx() -> Optional[Callable[[List[str]], np.ndarray]]:
+    sess = _onnx_session()
+    tok = _onnx_tokenizer()
+    if sess is None or tok is None:
+        return None
+    input_names = {i.name for i in sess.get_inputs()}
+    pooling = os.getenv("EMBED_POOLING", "cls").lower()  # arctic-embed uses the CLS token
+
+    def _embed(texts: List[str]) -> np.ndarray:
+        # Tokenize once without padding; each length bucket is padded only to its own max
+        enc = tok(texts, add_special_tokens=True, truncation=True, max_length=_max_length())
+        lengths = [len(x) for x in enc["input_ids"]]
+        vecs: Optional[np.ndarray] = None
+        for idx in _plan_buckets(lengths):
+            batch = tok.pad({k: [enc[k][i] for i in idx] for k in enc.keys()}, return_tensors="np")
+            feed = {k: v for k, v in batch.items() if k in input_names}
+            out = np.asarray(sess.run(None, feed)[0], dtype=np.float32)
+            if out.ndim == 3:  # last_hidden_state (batch, seq, hidden)
+                if pooling == "mean":
+                    mask = batch["attention_mask"][..., None].astype(np.float32)
+                    out = (out * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+                else:
+                    out = out[:, 0]
+            if vecs is None:
+                vecs = np.empty((len(texts), out.shape[1]), dtype=np.float32)
+            vecs[idx] = out
+        if vecs is None:
+            return _zeros(0)
+        vecs /= np.linalg.norm(vecs, axis=1, keepdims=True) + 1e-12
+        return vecs
 
     return _embed
 
 
+def _load_embedder() -> Optional[Callable[[List[str]], np.ndarray]]:
+    """Embedder for the configured backend; ONNX falls back to ST when unavailable."""
+    backend = _backend()
+    if backend == "onnx":
+        embedder = _try_load_onnx()
+        if embedder is not None:
+            return embedder
+        return _try_load_st()
+    if backend == "st":
+        return _try_load_st()
+    return None
+
+
+def _embedder_id() -> str:
+    """Which model would embed right now (part of every cache key).
+
+    ONNX falls back to ST when its model or tokenizer cannot be loaded, and to
+    the fp32 model when int8 quantization fails, so this names what actually
+    runs (the loaded session), not just what is configured.
+    """
+    backend = _backend()
+    if backend == "onnx" and _onnx_session() is not None and _onnx_tokenizer() is not None:
+        return f"onnx:{_ort_model_id}:{os.getenv('EMBED_POOLING', 'cls').lower()}"
+    if backend in ("st", "onnx"):
+        return "st:" + os.getenv("EMBEDDING_MODEL", "dragonkue/snowflake-arctic-embed-l-v2.0-ko")
+    return "none"
+
+
 def _get_redis():
     global _redis
     if _redis is not None:
@@ -63,12 +272,14 @@ def _prefix(text: str, role: str) -> str:
     return f"{pref}{text}"
 
 
-def _hash_key(text: str, role: str, dim: int) -> str:
+def _hash_key(text: str, role: str, dim: int, embedder: str) -> str:
     h = hashlib.sha1()
     model_name = os.getenv("EMBEDDING_MODEL", "dragonkue/snowflake-arctic-embed-l-v2.0-ko")
     key_src = json.dumps(
         {
             "model": model_name,
+            # Backend + model actually used (see _embedder_id): ST, fp32 and int8 ONNX never mix
+            "embedder": embedder,
             "role": role,
             "dim": dim,
             "use_tpl": os.getenv("EMBED_USE_TEMPLATE", "1"),
@@ -83,59 +294,265 @@ def _hash_key(text: str, role: str, dim: int) -> str:
     return h.hexdigest()
 
 
-def embed_texts(texts: List[str], dim: int = 1024, role: str = "passage") -> List[List[float]]:
-    """Embedding helper with optional ST backend and Redis cache.
+def _lru_size() -> int:
+    return int(os.getenv("EMBED_LRU_SIZE", "4096"))
+
+
+def _lru_get(key: str) -> Optional[np.ndarray]:
+    with _lru_lock:
+        raw = _lru.get(key)
+        if raw is None:
+            return None
+        _lru.move_to_end(key)
+    return np.frombuffer(raw, dtype="<f4")
+
+
+def _lru_put(key: str, vec: np.ndarray) -> None:
+    size = _lru_size()
+    if size <= 0:
+        return
+    raw = np.asarray(vec, dtype="<f4").tobytes()
+    with _lru_lock:
+        _lru[key] = raw
+        _lru.move_to_end(key)
+        while len(_lru) > size:
+            _lru.popitem(last=False)
+
+
+# Redis value layout: b"EV" + dtype (b"f" float32 | b"e" float16) + codec (b"z" zlib | b"-" raw) + little-endian floats
+_DTYPES = {b"f": "<f4", b"e": "<f2"}
+
+
+def _encode_vec(vec: np.ndarray) -> bytes:
+    dtype = b"e" if os.getenv("EMBED_CACHE_DTYPE", "float32").lower() == "float16" else b"f"
+    body = np.asarray(vec).astype(_DTYPES[dtype], copy=False).tobytes()
+    if os.getenv("EMBED_CACHE_COMPRESS", "0") == "1":
+        return b"EV" + dtype + b"z" + zlib.compress(body, 1)
+    return b"EV" + dtype + b"-" + body
+
+
+def _decode_vec(raw: bytes) -> Optional[np.ndarray]:
+    if raw[:2] == b"EV" and len(raw) >= 4:
+        body = zlib.decompress(raw[4:]) if raw[3:4] == b"z" else raw[4:]
+        return np.frombuffer(body, dtype=_DTYPES[raw[2:3]]).astype(np.float32)
+    # Legacy entries written as JSON lists
+    vec = json.loads(raw)
+    return np.asarray(vec, dtype=np.float32) if isinstance(vec, list) else None
+
+
+def embed_texts(texts: List[str], dim: int = 1024, role: str = "passage") -> np.ndarray:
+    """Embedding helper with optional ST/ONNX backend and two-level cache.
+
+    Returns a contiguous float32 matrix of shape (len(texts), dim); convert rows
+    to lists only at an API boundary that needs them.
 
     - role: "query" or "passage" (applies templates if enabled)
-    - Cache: set EMBED_CACHE=redis to reuse vectors across processes
+    - Cache: in-process LRU (EMBED_LRU_SIZE entries) always on; set EMBED_CACHE=redis
+      to share vectors across processes (packed EMBED_CACHE_DTYPE floats, EMBED_CACHE_TTL)
     """
-    use_st = os.getenv("USE_ST", "0") == "1"
     red = _get_redis()
 
-    keys = [_hash_key(t, role, dim) for t in texts]
-    vecs: List[Optional[List[float]]] = [None] * len(texts)
+    embedder_id = _embedder_id()
+    keys = [_hash_key(t, role, dim, embedder_id) for t in texts]
+    out = _zeros(len(texts), dim)
+    missing: List[int] = []
+    for i, k in enumerate(keys):
+        v = _lru_get(k)
+        if v is not None and v.shape[0] == dim:
+            out[i] = v
+        else:
+            missing.append(i)
 
-    # Try cache fetch
-    if red is not None:
+    # Try Redis for in-process misses
+    if red is not None and missing:
         try:
             pipe = red.pipeline()
-            for k in keys:
-                pipe.get(f"embed:{k}")
+            for i in missing:
+                pipe.get(f"embed:{keys[i]}")
             cached = pipe.execute()
-            for i, raw in enumerate(cached):
+            still: List[int] = []
+            for i, raw in zip(missing, cached):
+                v = None
                 if raw:
                     try:
-                        vecs[i] = json.loads(raw)
+                        v = _decode_vec(raw)
                     except Exception:
-                        vecs[i] = None
+                        v = None
+                if v is not None and v.shape[0] == dim:
+                    out[i] = v
+                    _lru_put(keys[i], v)
+                else:
+                    still.append(i)
+            missing = still
         except Exception:
             pass
 
     # Prepare texts to embed (prefix templates)
-    to_embed_idx: List[int] = [i for i, v in enumerate(vecs) if v is None]
-    if to_embed_idx:
-        prep = [_prefix(texts[i], role) for i in to_embed_idx]
-        computed: List[List[float]]
-        if use_st:
-            embedder = _try_load_st()
-            computed = embedder(prep)
-        else:
-            computed = [[0.0] * dim for _ in prep]
-        for idx, v in zip(to_embed_idx, computed):
-            vecs[idx] = v
-            if red is not None:
+    embedder = _load_embedder() if missing else None
+    if missing and embedder is not None:
+        prep = [_prefix(texts[i], role) for i in missing]
+        out[missing] = embedder(prep)
+        # Only real model outputs are cached: never zero rows (no model, failed pass)
+        ttl = int(os.getenv("EMBED_CACHE_TTL", str(7 * 24 * 3600)))
+        pipe = red.pipeline() if red is not None else None
+        for i in missing:
+            if not out[i].any():
+                continue
+            _lru_put(keys[i], out[i])
+            if pipe is not None:
+                pipe.set(f"embed:{keys[i]}", _encode_vec(out[i]), ex=ttl if ttl > 0 else None)
+        if pipe is not None:
+            try:
+                pipe.execute()
+            except Exception:
+                pass
+
+    return out
+
+
+class _QueryBatcher:
+    """Coalesces concurrent ``embed_query`` calls into batched forward passes.
+
+    Callers enqueue single texts and block on a future. One background thread
+    takes the first waiting query, collects more for up to EMBED_QUERY_BATCH_WINDOW_MS
+    (or until EMBED_QUERY_MAX_BATCH), runs them through ``embed_texts`` in one call
+    and fans the rows back out.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[Tuple[str, int, float, Future]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._stats = {"batches": 0, "queries": 0, "max_batch": 0, "wait_ms_total": 0.0}
+
+    def _ensure_thread(self) -> None:
+        with self._lock:
+            # Threads do not survive fork; start a fresh queue/thread in the child
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._queue = queue.Queue()
+            self._thread = threading.Thread(target=self._run, name="embed-query-batcher", daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def submit(self, text: str, dim: int) -> Future:
+        self._ensure_thread()
+        fut: Future = Future()
+        self._queue.put((text, dim, time.perf_counter(), fut))
+        return fut
+
+    def alive(self) -> bool:
+        with self._lock:
+            return self._thread is not None and self._thread.is_alive() and self._pid == os.getpid()
+
+    def _run(self) -> None:
+        q = self._queue
+        while True:
+            batch = [q.get()]
+            window = float(os.getenv("EMBED_QUERY_BATCH_WINDOW_MS", "3")) / 1000.0
+            max_batch = int(os.getenv("EMBED_QUERY_MAX_BATCH", "32"))
+            deadline = time.perf_counter() + window
+            while len(batch) < max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
                 try:
-                    red.set(f"embed:{keys[idx]}", json.dumps(v))
-                except Exception:
-                    pass
+                    batch.append(q.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._dispatch(batch)
+            except Exception as e:  # keep the thread alive for the next batch
+                for *_, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+
+    def _dispatch(self, batch: List[Tuple[str, int, float, Future]]) -> None:
+        # Callers that gave up (embed_query timeout) cancelled their future
+        batch = [item for item in batch if item[3].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        started = time.perf_counter()
+        waits = [started - enq for _, _, enq, _ in batch]
+        with self._lock:
+            self._stats["batches"] += 1
+            self._stats["queries"] += len(batch)
+            self._stats["max_batch"] = max(self._stats["max_batch"], len(batch))
+            self._stats["wait_ms_total"] += sum(waits) * 1000.0
+        if _QUERY_BATCH_SIZE is not None:
+            _QUERY_BATCH_SIZE.observe(len(batch))
+            for w in waits:
+                _QUERY_QUEUE_WAIT.observe(w)  # type: ignore[union-attr]
+        by_dim: Dict[int, List[Tuple[str, Future]]] = {}
+        for text, dim, _, fut in batch:
+            by_dim.setdefault(dim, []).append((text, fut))
+        for dim, items in by_dim.items():
+            try:
+                vecs = embed_texts([t for t, _ in items], dim=dim, role="query")
+            except Exception as e:
+                for _, fut in items:
+                    fut.set_exception(e)
+                continue
+            for row, (_, fut) in enumerate(items):
+                fut.set_result(vecs[row])
 
-    # type: ignore - all filled
-    return [v or [0.0] * dim for v in vecs]
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            st = dict(self._stats)
+        st["avg_batch"] = round(st["queries"] / st["batches"], 2) if st["batches"] else 0.0
+        st["avg_wait_ms"] = round(st["wait_ms_total"] / st["queries"], 3) if st["queries"] else 0.0
+        st["wait_ms_total"] = round(st["wait_ms_total"], 1)
+        return st
 
 
-def embed_query(texts: List[str], dim: int = 1024) -> List[List[float]]:
-    return embed_texts(texts, dim=dim, role="query")
+_query_batcher = _QueryBatcher()
+
+
+def query_batcher_stats() -> Dict[str, Any]:
+    """Counters for the query micro-batcher (batches, queries, avg/max batch, avg queue wait)."""
+    return _query_batcher.stats()
+
+
+def _query_batching_enabled() -> bool:
+    if float(os.getenv("EMBED_QUERY_BATCH_WINDOW_MS", "3")) <= 0:
+        return False
+    # Nothing to coalesce without a model (zero-vector stub)
+    return _backend() in ("st", "onnx")
+
+
+def embed_query(texts: List[str], dim: int = 1024) -> np.ndarray:
+    """Embed queries; concurrent callers share batched forward passes.
+
+    LRU hits return immediately. Otherwise each text goes through the process-wide
+    micro-batcher (EMBED_QUERY_BATCH_WINDOW_MS=0 disables it). Texts the batcher
+    has not answered within EMBED_QUERY_TIMEOUT_MS are embedded directly instead.
+    """
+    if not texts or not _query_batching_enabled():
+        return embed_texts(texts, dim=dim, role="query")
+    out = _zeros(len(texts), dim)
+    pending: List[Tuple[int, Future]] = []
+    embedder_id = _embedder_id()
+    for i, t in enumerate(texts):
+        v = _lru_get(_hash_key(t, "query", dim, embedder_id))
+        if v is not None and v.shape[0] == dim:
+            out[i] = v
+        else:
+            pending.append((i, _query_batcher.submit(t, dim)))
+    deadline = time.perf_counter() + float(os.getenv("EMBED_QUERY_TIMEOUT_MS", "30000")) / 1000.0
+    late: List[int] = []
+    for i, fut in pending:
+        try:
+            # A dead batcher thread will never answer: don't wait for it
+            timeout = max(0.0, deadline - time.perf_counter()) if _query_batcher.alive() else 0.0
+            out[i] = fut.result(timeout=timeout)
+        except FutureTimeout:
+            fut.cancel()
+            late.append(i)
+    if late:
+        out[late] = embed_texts([texts[i] for i in late], dim=dim, role="query")
+    return out
 
 
-def embed_passages(texts: List[str], dim: int = 1024) -> List[List[float]]:
+def embed_passages(texts: List[str], dim: int = 1024) -> np.ndarray:
     return embed_texts(texts, dim=dim, role="passage")
@@ -1,9 +1,97 @@
-from typing import List, Dict, Iterable, Optional
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+import asyncio
+import json as _json
 import os
+import threading
+import weakref
+
+
+# Process-wide pooled HTTP clients (keep-alive, HTTP/2 when available)
+_client: Any = None
+_client_pid: Optional[int] = None
+# event loop -> httpx.AsyncClient; weak so a loop that is gone drops its client
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+_clients_lock = threading.Lock()
+
+
+def _limits() -> Any:
+    import httpx
+
+    sessions = int(os.getenv("LLM_MAX_SESSIONS", "4"))
+    return httpx.Limits(
+        # Generation is capped at LLM_MAX_SESSIONS; leave headroom for query expansion/rerank calls
+        max_connections=int(os.getenv("LLM_POOL_MAX_CONNECTIONS", str(sessions * 2))),
+        max_keepalive_connections=int(os.getenv("LLM_POOL_KEEPALIVE", str(sessions))),
+        keepalive_expiry=float(os.getenv("LLM_KEEPALIVE_EXPIRY", "30")),
+    )
+
+
+def _http2() -> bool:
+    # HTTP/2 needs the h2 package and is only negotiated over TLS; plain http stays HTTP/1.1
+    if os.getenv("LLM_HTTP2", "1") != "1":
+        return False
+    try:
+        import h2  # noqa: F401
+    except Exception:
+        return False
+    return True
+
+
+def _get_client() -> Any:
+    """Shared ``httpx.Client`` (recreated after fork)."""
+    global _client, _client_pid
+    import httpx
+
+    with _clients_lock:
+        if _client is None or _client_pid != os.getpid():
+            _client = httpx.Client(limits=_limits(), http2=_http2())
+            _client_pid = os.getpid()
+        return _client
+
+
+def _get_async_client() -> Any:
+    """Shared ``httpx.AsyncClient`` for the running event loop."""
+    import httpx
+
+    loop = asyncio.get_running_loop()
+    with _clients_lock:
+        # Open connections keep their loop alive, so also drop clients of loops already closed
+        for old in [lp for lp in _async_clients.keys() if lp.is_closed()]:
+            _async_clients.pop(old, None)
+        cli = _async_clients.get(loop)
+        if cli is None or cli.is_closed:
+            cli = httpx.AsyncClient(limits=_limits(), http2=_http2())
+            _async_clients[loop] = cli
+        return cli
+
+
+def close_clients() -> None:
+    """Close the shared sync client (e.g. on shutdown)."""
+    global _client
+    with _clients_lock:
+        if _client is not None:
+            try:
+                _client.close()
+            except Exception:
+                pass
+        _client = None
+
+
+async def aclose_clients() -> None:
+    """Close the shared async client of the running loop."""
+    loop = asyncio.get_running_loop()
+    with _clients_lock:
+        cli = _async_clients.pop(loop, None)
+    if cli is not None:
+        await cli.aclose()
 
 
 class LLMClient:
-    """Client for local LLM server (Ollama/OpenAI-Compat)."""
+    """Client for local LLM server (Ollama/OpenAI-Compat).
+
+    Instances are cheap: all of them share the process-wide connection pools,
+    sized from LLM_MAX_SESSIONS (see ``_limits``).
+    """
 
     def __init__(
         self,
@@ -21,12 +109,8 @@ class LLMClient:
         self.api = os.getenv("LLM_API", "ollama")  # ollama | openai
         self.timeout = float(os.getenv("LLM_TIMEOUT", "60"))
 
-    def chat(self, messages: List[Dict[str, str]]) -> str:
-        try:
-            import httpx
-        except Exception:
-            return "Not implemented (LLM call stub)."
-
+    def _request(self, messages: List[Dict[str, str]], stream: bool) -> Tuple[str, Dict[str, Any], Dict[str, str]]:
+        """(url, payload, headers) for a chat call against the configured API."""
         if self.api == "openai":
             url = self.base_url.rstrip("/") + "/v1/chat/completions"
             payload = {
@@ -34,19 +118,13 @@ class LLMClient:
                 "messages": messages,
                 "temperature": float(os.getenv("LLM_TEMPERATURE", "0.2")),
                 "max_tokens": int(os.getenv("LLM_MAX_TOKENS", "512")),
-                "stream": False,
+                "stream": stream,
             }
-            try:
-                headers = {}
-                api_key = os.getenv("OPENAI_API_KEY") or os.getenv("LLM_API_KEY")
-                if api_key:
-                    headers["Authorization"] = f"Bearer {api_key}"
-                r = httpx.post(url, json=payload, headers=headers, timeout=self.timeout)
-                r.raise_for_status()
-                data = r.json()
-                return data["choices"][0]["message"]["content"]
-            except Exception:
-                return ""
+            headers = {}
+            api_key = os.getenv("OPENAI_API_KEY") or os.getenv("LLM_API_KEY")
+            if api_key:
+                headers["Authorization"] = f"Bearer {api_key}"
+            return url, payload, headers
 
         # Default: Ollama API
         url = self.base_url.rstrip("/") + "/api/chat"
@@ -58,84 +136,105 @@ class LLMClient:
                 "num_ctx": int(os.getenv("LLM_CONTEXT", "8192")),
                 "num_predict": int(os.getenv("LLM_MAX_TOKENS", "512")),
             },
-            "stream": False,
+            "stream": stream,
         }
+        return url, payload, {}
+
+    def _content(self, data: Any) -> str:
+        if self.api == "openai":
+            return data["choices"][0]["message"]["content"]
+        # Ollama chat (non-stream) returns {message:{content:...}}
+        if isinstance(data, dict) and "message" in data:
+            return data["message"].get("content", "")
+        return ""
+
+    def _delta(self, line: str) -> str:
+        """Text delta from one streamed line ("" if none)."""
+        if not line:
+            return ""
         try:
-            r = httpx.post(url, json=payload, timeout=self.timeout)
-            r.raise_for_status()
-            data = r.json()
-            # Ollama chat (non-stream) returns {message:{content:...}}
-            if isinstance(data, dict) and "message" in data:
-                return data["message"].get("content", "")
+            if self.api == "openai":
+                # Expect lines like: data: {json}
+                if line.startswith("data: "):
+                    obj = _json.loads(line[len("data: ") :])
+                    return obj["choices"][0]["delta"].get("content", "") or ""
+                return ""
+            # Ollama streaming via /api/chat with stream=true returns JSON lines
+            obj = _json.loads(line)
+            msg = obj.get("message") or {}
+            return msg.get("content", "")
+        except Exception:
             return ""
-        except Exception as e:
+
+    def _stream_timeout(self) -> Optional[float]:
+        # Ollama streams can idle for a long time while the model loads
+        return self.timeout if self.api == "openai" else None
+
+    def _failed(self, e: Exception) -> str:
+        if self.api != "openai":
             import sys
             print(f"LLM call failed: {e}", file=sys.stderr)
-            return ""
+        return ""
+
+    def chat(self, messages: List[Dict[str, str]]) -> str:
+        try:
+            import httpx  # noqa: F401
+        except Exception:
+            return "Not implemented (LLM call stub)."
+
+        url, payload, headers = self._request(messages, stream=False)
+        try:
+            r = _get_client().post(url, json=payload, headers=headers, timeout=self.timeout)
+            r.raise_for_status()
+            return self._content(r.json())
+        except Exception as e:
+            return self._failed(e)
 
     def chat_stream(self, messages: List[Dict[str, str]]) -> Iterable[str]:
         """Yield text deltas as they arrive (SSE-ready)."""
         try:
-            import httpx
+            import httpx  # noqa: F401
         except Exception:
             yield ""
             return
 
-        if self.api == "openai":
-            url = self.base_url.rstrip("/") + "/v1/chat/completions"
-            payload = {
-                "model": self.model,
-                "messages": messages,
-                "temperature": float(os.getenv("LLM_TEMPERATURE", "0.2")),
-                "max_tokens": int(os.getenv("LLM_MAX_TOKENS", "512")),
-                "stream": True,
-            }
-            headers = {}
-            api_key = os.getenv("OPENAI_API_KEY") or os.getenv("LLM_API_KEY")
-            if api_key:
-                headers["Authorization"] = f"Bearer {api_key}"
-            with httpx.stream("POST", url, json=payload, headers=headers, timeout=self.timeout) as r:
-                r.raise_for_status()
-                for line in r.iter_lines():
-                    if not line:
-                        continue
-                    # Expect lines like: data: {json}
-                    try:
-                        if line.startswith("data: "):
-                            import json as _json
-
-                            obj = _json.loads(line[len("data: ") :])
-                            delta = obj["choices"][0]["delta"].get("content", "")
-                            if delta:
-                                yield delta
-                    except Exception:
-                        continue
-            return
+        url, payload, headers = self._request(messages, stream=True)
+        with _get_client().stream("POST", url, json=payload, headers=headers, timeout=self._stream_timeout()) as r:
+            r.raise_for_status()
+            for line in r.iter_lines():
+                delta = self._delta(line)
+                if delta:
+                    yield delta
 
-        # Ollama streaming via /api/chat with stream=true returns JSON lines
-        url = self.base_url.rstrip("/") + "/api/chat"
-        payload = {
-            "model": self.model,
-            "messages": messages,
-            "options": {
-                "temperature": float(os.getenv("LLM_TEMPERATURE", "0.2")),
-                "num_ctx": int(os.getenv("LLM_CONTEXT", "8192")),
-                "num_predict": int(os.getenv("LLM_MAX_TOKENS", "512")),
-            },
-            "stream": True,
-        }
-        with httpx.stream("POST", url, json=payload, timeout=None) as r:
+    async def achat(self, messages: List[Dict[str, str]]) -> str:
+        """Coroutine version of ``chat`` on the shared AsyncClient."""
+        try:
+            import httpx  # noqa: F401
+        except Exception:
+            return "Not implemented (LLM call stub)."
+
+        url, payload, headers = self._request(messages, stream=False)
+        try:
+            r = await _get_async_client().post(url, json=payload, headers=headers, timeout=self.timeout)
             r.raise_for_status()
-            import json as _json
+            return self._content(r.json())
+        except Exception as e:
+            return self._failed(e)
 
-            for line in r.iter_lines():
-                if not line:
-                    continue
-                try:
-                    obj = _json.loads(line)
-                    msg = obj.get("message") or {}
-                    content = msg.get("content", "")
-                    if content:
-                        yield content
-                except Exception:
-                    continue
+    async def achat_stream(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """Async generator of text deltas (does not block the event loop)."""
+        try:
+            import httpx  # noqa: F401
+        except Exception:
+            yield ""
+            return
+
+        url, payload, headers = self._request(messages, stream=True)
+        async with _get_async_client().stream(
+            "POST", url, json=payload, headers=headers, timeout=self._stream_timeout()
+        ) as r:
+            r.raise_for_status()
+            async for line in r.aiter_lines():
+                delta = self._delta(line)
+                if delta:
+                    yield delta
@@ -1,11 +1,31 @@
 import os
-from typing import Any, List, Tuple
+import hashlib
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 
 _ort_session = None
 _ce_model = None
 _tokenizer = None
 
+# Raw cross-encoder logits keyed by (scorer, normalized query, doc id, text hash)
+_score_cache: "OrderedDict[str, float]" = OrderedDict()
+_score_cache_lock = threading.Lock()
+_cache_counts = {"hits": 0, "misses": 0}
+
+try:
+    from prometheus_client import Counter
+
+    _CACHE_LOOKUPS = Counter(  # type: ignore
+        "rerank_score_cache_total", "Cross-encoder score cache lookups", ["result"]
+    )
+except Exception:  # pragma: no cover
+    _CACHE_LOOKUPS = None
+
 
 def _use_rerank() -> bool:
     return os.getenv("USE_RERANK", "1") == "1"
@@ -15,6 +35,15 @@ def _backend() -> str:
     return os.getenv("RERANK_BACKEND", "st")  # st | onnx
 
 
+_GRAPH_OPT_LEVELS = {
+    "disable": "ORT_DISABLE_ALL",
+    "basic": "ORT_ENABLE_BASIC",
+    "extended": "ORT_ENABLE_EXTENDED",
+    "all": "ORT_ENABLE_ALL",
+}
+_load_lock = threading.Lock()
+
+
 def _onnx_session() -> Any:
     global _ort_session
     if _ort_session is not None:
@@ -26,8 +55,16 @@ def _onnx_session() -> Any:
     model_path = os.getenv("RERANKER_ONNX_PATH")
     if not model_path or not os.path.exists(model_path):
         return None
-    providers = ["CPUExecutionProvider"]
-    _ort_session = ort.InferenceSession(model_path, providers=providers)
+    with _load_lock:
+        if _ort_session is None:
+            opts = ort.SessionOptions()
+            opts.intra_op_num_threads = int(os.getenv("RERANK_ONNX_INTRA_THREADS", "0"))  # 0 = ORT default
+            opts.inter_op_num_threads = int(os.getenv("RERANK_ONNX_INTER_THREADS", "0"))
+            level = _GRAPH_OPT_LEVELS.get(os.getenv("RERANK_ONNX_OPT_LEVEL", "all").lower(), "ORT_ENABLE_ALL")
+            opts.graph_optimization_level = getattr(ort.GraphOptimizationLevel, level)
+            opts.enable_cpu_mem_arena = os.getenv("RERANK_ONNX_MEM_ARENA", "1") == "1"
+            providers = ["CPUExecutionProvider"]
+            _ort_session = ort.InferenceSession(model_path, sess_options=opts, providers=providers)
     return _ort_session
 
 
@@ -53,7 +90,7 @@ def _st_cross_encoder():
     except Exception:  # pragma: no cover
         return None
     model_name = os.getenv("RERANK_MODEL", "BAAI/bge-reranker-small")
-    _ce_model = CrossEncoder(model_name)
+    _ce_model = CrossEncoder(model_name, max_length=int(os.getenv("RERANK_MAX_LENGTH", "512")))
     return _ce_model
 
 
@@ -66,74 +103,314 @@ def _minmax(xs: List[float]) -> List[float]:
     return [(x - lo) / (hi - lo) for x in xs]
 
 
+def _max_length(tok: Any, query: str) -> int:
+    """Pair truncation length: RERANK_MAX_LENGTH, tightened to query + RERANK_PASSAGE_TOKENS."""
+    max_len = int(os.getenv("RERANK_MAX_LENGTH", "512"))
+    cap = int(os.getenv("RERANK_PASSAGE_TOKENS", "0"))
+    if cap > 0:
+        qlen = len(tok(query, add_special_tokens=True)["input_ids"])
+        max_len = min(max_len, qlen + cap + 1)  # +1 for the separator
+    return max_len
+
+
+def _to_scores(logits: Any) -> List[float]:
+    # Support shapes (batch, 1) or (batch,) or (batch, 2)
+    import numpy as np
+
+    arr = np.array(logits)
+    if arr.ndim == 2 and arr.shape[1] == 1:
+        return arr[:, 0].tolist()
+    if arr.ndim == 2 and arr.shape[1] == 2:
+        return arr[:, 1].tolist()
+    return arr.reshape(-1).tolist()
+
+
+def _run_onnx(sess: Any, feed: Dict[str, Any]) -> Any:
+    """One forward pass; with RERANK_ONNX_IO_BINDING=1 inputs are bound in place."""
+    if os.getenv("RERANK_ONNX_IO_BINDING", "0") != "1":
+        return sess.run(None, feed)[0]
+    import numpy as np
+
+    binding = sess.io_binding()
+    for name, arr in feed.items():
+        binding.bind_cpu_input(name, np.ascontiguousarray(arr))
+    binding.bind_output(sess.get_outputs()[0].name)
+    sess.run_with_iobinding(binding)
+    return binding.copy_outputs_to_cpu()[0]
+
+
+def _onnx_scores(sess: Any, tok: Any, query: str, texts: List[str]) -> List[float]:
+    """Score (query, text) pairs in length-sorted sub-batches of RERANK_ONNX_BATCH.
+
+    Pairs are tokenized once without padding; each sub-batch is padded only to
+    its own longest pair, so short passages do not pay for long ones.
+    """
+    enc = tok(
+        [query] * len(texts),
+        texts,
+        truncation="only_second",  # never cut the query, only the passage
+        max_length=_max_length(tok, query),
+    )
+    input_names = {i.name for i in sess.get_inputs()}
+    keys = list(enc.keys())
+    lengths = [len(ids) for ids in enc["input_ids"]]
+    order = sorted(range(len(texts)), key=lambda i: lengths[i])
+    batch = max(1, int(os.getenv("RERANK_ONNX_BATCH", "16")))
+    scores: List[float] = [0.0] * len(texts)
+    for b in range(0, len(order), batch):
+        idx = order[b:b + batch]
+        padded = tok.pad({k: [enc[k][i] for i in idx] for k in keys}, return_tensors="np")
+        feed = {k: v for k, v in padded.items() if k in input_names}
+        for i, v in zip(idx, _to_scores(_run_onnx(sess, feed))):
+            scores[i] = float(v)
+    return scores
+
+
+def warmup() -> bool:
+    """Load the reranker and run a short and a long dummy pair through it.
+
+    Called at service startup so the first request does not pay model load,
+    graph optimization and allocator growth. Returns whether a model ran.
+    """
+    if not _use_rerank():
+        return False
+    try:
+        picked = _scorer()
+        if picked is None:
+            return False
+        _id, score = picked
+        score("warmup", ["warmup", "warmup " * int(os.getenv("RERANK_MAX_LENGTH", "512"))])
+        return True
+    except Exception:
+        return False
+
+
+def _scorer() -> Optional[Tuple[str, Callable[[str, List[str]], List[float]]]]:
+    """Pick the cross-encoder for this request: (scorer id, score fn) or None.
+
+    The id names the backend and model so cached logits are never mixed
+    between ONNX and Sentence-Transformers scores.
+    """
+    if _backend() == "onnx":
+        sess = _onnx_session()
+        tok = _onnx_tokenizer()
+        if sess is not None and tok is not None:
+            def _score_onnx(query: str, texts: List[str]) -> List[float]:
+                return _onnx_scores(sess, tok, query, texts)
+
+            scorer_id = f"onnx:{os.getenv('RERANKER_ONNX_PATH')}:{os.getenv('RERANK_MAX_LENGTH', '512')}:{os.getenv('RERANK_PASSAGE_TOKENS', '0')}"
+            return scorer_id, _score_onnx
+    # Fallback to Sentence-Transformers CrossEncoder
+    ce = _st_cross_encoder()
+    if ce is None:
+        return None
+
+    def _score_st(query: str, texts: List[str]) -> List[float]:
+        preds = ce.predict([(query, t) for t in texts])
+        return [float(x) for x in preds]
+
+    return f"st:{os.getenv('RERANK_MODEL', 'BAAI/bge-reranker-small')}:{os.getenv('RERANK_MAX_LENGTH', '512')}", _score_st
+
+
+def _normalize_query(query: str) -> str:
+    q = unicodedata.normalize("NFKC", query).lower()
+    q = re.sub(r"[?!.,~]+$", "", q.strip())
+    return re.sub(r"\s+", " ", q).strip()
+
+
+def _cache_key(qhash: str, doc_id: str, text: str) -> str:
+    thash = hashlib.sha1(text.encode("utf-8")).hexdigest()
+    return f"{qhash}:{doc_id}:{thash}"
+
+
+def _cache_get(keys: List[str]) -> List[Optional[float]]:
+    with _score_cache_lock:
+        out: List[Optional[float]] = []
+        for k in keys:
+            v = _score_cache.get(k)
+            if v is not None:
+                _score_cache.move_to_end(k)
+            out.append(v)
+        hits = sum(1 for v in out if v is not None)
+        _cache_counts["hits"] += hits
+        _cache_counts["misses"] += len(keys) - hits
+    if _CACHE_LOOKUPS is not None:
+        _CACHE_LOOKUPS.labels(result="hit").inc(hits)
+        _CACHE_LOOKUPS.labels(result="miss").inc(len(keys) - hits)
+    return out
+
+
+def _cache_put(items: Dict[str, float]) -> None:
+    size = int(os.getenv("RERANK_CACHE_SIZE", "20000"))
+    if size <= 0:
+        return
+    with _score_cache_lock:
+        for k, v in items.items():
+            _score_cache[k] = v
+            _score_cache.move_to_end(k)
+        while len(_score_cache) > size:
+            _score_cache.popitem(last=False)
+
+
+def rerank_cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters and size of the cross-encoder score cache."""
+    with _score_cache_lock:
+        hits, misses = _cache_counts["hits"], _cache_counts["misses"]
+        size = len(_score_cache)
+    total = hits + misses
+    return {"hits": hits, "misses": misses, "hit_rate": round(hits / total, 4) if total else 0.0, "size": size}
+
+
+def _ce_scores(query: str, items: List[Tuple[str, float, str]], use_cache: bool = True) -> List[float]:
+    """Raw CE logits for items, scoring only the pairs missing from the cache."""
+    picked = _scorer()
+    if picked is None:
+        return []
+    scorer_id, score = picked
+    if not use_cache:
+        return [float(v) for v in score(query, [t for _id, _s, t in items])]
+    qhash = hashlib.sha1(f"{scorer_id}\n{_normalize_query(query)}".encode("utf-8")).hexdigest()
+    keys = [_cache_key(qhash, doc_id, text) for doc_id, _s, text in items]
+    scores = _cache_get(keys)
+    missing = [i for i, v in enumerate(scores) if v is None]
+    if missing:
+        fresh = score(query, [items[i][2] for i in missing])
+        if len(fresh) != len(missing):
+            return []
+        for i, v in zip(missing, fresh):
+            scores[i] = float(v)
+        _cache_put({keys[i]: scores[i] for i in missing})  # type: ignore[misc]
+    return scores  # type: ignore[return-value]
+
+
+def _settings(overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Rerank budget from env, with per-request overrides (e.g. from eval runs)."""
+    st: Dict[str, Any] = {
+        "depth": int(os.getenv("RERANK_DEPTH", "0")),  # 0 = max(40, top_k*2)
+        "budget_ms": float(os.getenv("RERANK_BUDGET_MS", "0")),  # 0 = no time limit
+        "skip_gap": float(os.getenv("RERANK_SKIP_GAP", "0")),  # 0 = always rerank
+        "cascade_band": int(os.getenv("RERANK_CASCADE_BAND", "0")),  # 0 = CE on every candidate
+        "batch": int(os.getenv("RERANK_BATCH", "16")),
+        "use_cache": 1,  # eval runs turn the score cache off to measure cold latency
+    }
+    for k, v in (overrides or {}).items():
+        if k not in st or v is None:
+            continue  # unknown keys are ignored
+        try:
+            st[k] = type(st[k])(v)
+        except (TypeError, ValueError):
+            pass  # keep the env default rather than failing the search
+    return st
+
+
+def rerank_depth(top_k: int, overrides: Optional[Dict[str, Any]] = None) -> int:
+    """How many first-stage candidates to hand to ``rerank``."""
+    depth = _settings(overrides)["depth"]
+    return max(depth, top_k) if depth > 0 else max(40, top_k * 2)
+
+
+def _bigrams(text: str) -> set:
+    s = re.sub(r"\s+", "", text.lower())
+    return {s[i:i + 2] for i in range(len(s) - 1)}
+
+
+def _cheap_scores(query: str, items: List[Tuple[str, float, str]], nfused: List[float]) -> List[float]:
+    """First cascade stage: normalized fused score plus query bigram coverage.
+
+    Character bigrams keep the overlap meaningful for Korean, where query
+    terms rarely match passage tokens exactly.
+    """
+    qgrams = _bigrams(query)
+    out: List[float] = []
+    for (_id, _s, text), nf in zip(items, nfused):
+        cover = len(qgrams & _bigrams(text)) / len(qgrams) if qgrams else 0.0
+        out.append(0.5 * nf + 0.5 * cover)
+    return out
+
+
+def _fused_order(items: List[Tuple[str, float, str]], top_k: int) -> List[Tuple[str, float]]:
+    return sorted([(i[0], i[1]) for i in items], key=lambda x: x[1], reverse=True)[:top_k]
+
+
 def rerank(
-    query: str, items: List[Tuple[str, float, str]], top_k: int = 20
+    query: str,
+    items: List[Tuple[str, float, str]],
+    top_k: int = 20,
+    stats: Optional[Dict[str, Any]] = None,
+    options: Optional[Dict[str, Any]] = None,
 ) -> List[Tuple[str, float]]:
     """Rerank candidates using bge-reranker-small.
 
     items: list of (doc_id, fused_score, text)
     Returns: list of (doc_id, final_score) sorted desc.
+    Raw CE scores are cached per (normalized query, doc id, text hash) in a
+    bounded LRU (RERANK_CACHE_SIZE), so repeated queries only score new passages.
+
+    The CE stage is budgeted (see ``_settings``; ``options`` overrides env):
+    - skip_gap: keep first-stage order when the normalized top-1 lead is at least this
+    - cascade_band: CE only scores this many best candidates by ``_cheap_scores``;
+      the rest stay below them in cheap order
+    - budget_ms: stop scoring further CE batches once the budget is spent
+    ``stats`` (if given) receives the mode taken and how many pairs the CE scored.
     """
+    st = _settings(options)
+    info: Dict[str, Any] = {"mode": "off", "candidates": len(items), "ce_scored": 0}
+    if stats is not None:
+        stats["rerank"] = info
     if not _use_rerank() or not items:
-        return sorted([(i[0], i[1]) for i in items], key=lambda x: x[1], reverse=True)[
-            :top_k
-        ]
+        return _fused_order(items, top_k)
 
-    backend = _backend()
-    texts = [t for _id, _s, t in items]
     fused = [s for _id, s, _t in items]
+    nfused = _minmax(fused)
 
+    if st["skip_gap"] > 0 and len(items) > 1:
+        top2 = sorted(nfused, reverse=True)[:2]
+        if top2[0] - top2[1] >= st["skip_gap"]:
+            info["mode"] = "skip_gap"
+            return _fused_order(items, top_k)
+
+    cheap = _cheap_scores(query, items, nfused)
+    order = sorted(range(len(items)), key=lambda i: cheap[i], reverse=True)
+    band = st["cascade_band"] if st["cascade_band"] > 0 else len(order)
+    todo, rest = order[:band], order[band:]
+    info["mode"] = "cascade" if rest else "ce"
+
+    t0 = time.perf_counter()
+    scored: List[int] = []
     ce_scores: List[float] = []
+    # Sub-batches only matter when there is a time budget to check between them
+    batch = max(1, st["batch"]) if st["budget_ms"] > 0 else max(1, len(todo))
     try:
-        if backend == "onnx":
-            sess = _onnx_session()
-            tok = _onnx_tokenizer()
-            if sess is not None and tok is not None:
-                pairs = list(zip([query] * len(texts), texts))
-                enc = tok(
-                    pairs,
-                    padding=True,
-                    truncation=True,
-                    max_length=int(os.getenv("RERANK_MAX_LENGTH", "512")),
-                    return_tensors="np",
-                )
-                feed = {}
-                for inp in sess.get_inputs():
-                    name = inp.name
-                    if name in enc:
-                        feed[name] = enc[name]
-                out = sess.run(None, feed)
-                logits = out[0]
-                # Support shapes (batch, 1) or (batch,) or (batch, 2)
-                import numpy as np
-
-                arr = np.array(logits)
-                if arr.ndim == 2 and arr.shape[1] == 1:
-                    ce_scores = arr[:, 0].tolist()
-                elif arr.ndim == 2 and arr.shape[1] == 2:
-                    ce_scores = arr[:, 1].tolist()
-                else:
-                    ce_scores = arr.reshape(-1).tolist()
-        if not ce_scores:
-            # Fallback to Sentence-Transformers CrossEncoder
-            ce = _st_cross_encoder()
-            if ce is not None:
-                pairs = [(query, t) for t in texts]
-                preds = ce.predict(pairs)
-                ce_scores = [float(x) for x in preds]
+        for b in range(0, len(todo), batch):
+            if b and st["budget_ms"] > 0 and (time.perf_counter() - t0) * 1000.0 >= st["budget_ms"]:
+                info["budget_exhausted"] = True
+                rest = todo[b:] + rest
+                break
+            idx = todo[b:b + batch]
+            got = _ce_scores(query, [items[i] for i in idx], use_cache=bool(st["use_cache"]))
+            if not got:
+                break
+            scored.extend(idx)
+            ce_scores.extend(got)
     except Exception:
-        ce_scores = []
+        pass
+    if len(ce_scores) != len(scored):
+        scored, ce_scores = [], []
+    info["ce_scored"] = len(scored)
+    info["ce_ms"] = round((time.perf_counter() - t0) * 1000.0, 1)
 
     if not ce_scores:
         # Last resort: no reranker available
-        return sorted([(i[0], i[1]) for i in items], key=lambda x: x[1], reverse=True)[
-            :top_k
-        ]
+        info["mode"] = "fallback"
+        return _fused_order(items, top_k)
 
     # Combine normalized fused score with CE score
-    nfused = _minmax(fused)
     nce = _minmax(ce_scores)
     alpha = float(os.getenv("RERANK_ALPHA", "0.7"))
-    combined = [alpha * s_ce + (1 - alpha) * s_f for s_ce, s_f in zip(nce, nfused)]
-    arr = list(zip([i[0] for i in items], combined))
-    return sorted(arr, key=lambda x: x[1], reverse=True)[:top_k]
+    combined = [alpha * s_ce + (1 - alpha) * nfused[i] for s_ce, i in zip(nce, scored)]
+    arr = sorted(zip([items[i][0] for i in scored], combined), key=lambda x: x[1], reverse=True)
+    if rest and len(arr) < top_k:
+        # Unscored candidates rank below every CE-scored one, in cheap-score order
+        floor = min(c for _, c in arr)
+        arr.extend((items[i][0], floor * cheap[i]) for i in rest)
+    return arr[:top_k]
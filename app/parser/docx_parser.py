@@ -6,6 +6,10 @@ except Exception:  # pragma: no cover
     docx = None  # type: ignore
 
 
+# Bump when extraction output changes; invalidates cached parses (worker parse_cache)
+PARSER_VERSION = "1"
+
+
 def parse_docx(path: str) -> List[str]:
     """Parse a Word document into paragraphs."""
     if not docx:  # pragma: no cover
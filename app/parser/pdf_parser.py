@@ -1,4 +1,4 @@
-from typing import List
+from typing import Iterator, List, Optional
 
 try:
     from pypdf import PdfReader
@@ -6,18 +6,43 @@ except Exception:  # pragma: no cover
     PdfReader = None  # type: ignore
 
 
+# Bump when extraction output changes; invalidates cached parses (worker parse_cache)
+PARSER_VERSION = "1"
+
+
+def iter_pdf_pages(path: str, start: int = 0, stop: Optional[int] = None) -> Iterator[str]:
+    """Yield page texts one at a time (pages [start, stop)), so callers can stream
+    a large PDF into the chunker without holding every page in memory."""
+    if not PdfReader:  # pragma: no cover
+        return
+    try:
+        reader = PdfReader(path)
+        n = len(reader.pages)
+    except Exception:
+        return
+    for i in range(max(0, start), n if stop is None else min(stop, n)):
+        try:
+            text = reader.pages[i].extract_text() or ""
+        except Exception:
+            text = ""
+        yield text
+
+
 def parse_pdf(path: str) -> List[str]:
     """Parse a PDF file into page texts."""
+    return list(iter_pdf_pages(path))
+
+
+def pdf_page_count(path: str) -> int:
+    """Number of pages, or 0 if the PDF cannot be opened."""
     if not PdfReader:  # pragma: no cover
-        return []
+        return 0
     try:
-        reader = PdfReader(path)
-        texts = []
-        for page in reader.pages:
-            try:
-                texts.append(page.extract_text() or "")
-            except Exception:
-                texts.append("")
-        return texts
+        return len(PdfReader(path).pages)
     except Exception:
-        return []
+        return 0
+
+
+def parse_pdf_pages(path: str, start: int, stop: int) -> List[str]:
+    """Parse pages [start, stop) of a PDF into page texts (for page-parallel parsing)."""
+    return list(iter_pdf_pages(path, start, stop))
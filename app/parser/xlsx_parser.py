@@ -1,4 +1,5 @@
-from typing import List
+import os
+from typing import Iterator, List
 
 try:
     import openpyxl
@@ -6,19 +7,63 @@ except Exception:  # pragma: no cover
     openpyxl = None  # type: ignore
 
 
-def parse_xlsx(path: str) -> List[str]:
-    """Parse an Excel file into sheet-row texts."""
+# Bump when extraction output changes; invalidates cached parses (worker parse_cache)
+PARSER_VERSION = "2"
+
+
+def _row_text(values) -> str:
+    cells = ["" if v is None else str(v) for v in values]
+    # read-only sheets pad rows to the sheet width; drop the empty tail
+    while cells and not cells[-1]:
+        cells.pop()
+    return "\t".join(cells)
+
+
+def iter_xlsx_blocks(path: str) -> Iterator[str]:
+    """Yield per-sheet row blocks, streaming the workbook in read-only mode.
+
+    Every block starts with the sheet name and the sheet's header row, and is
+    kept under XLSX_BLOCK_CHARS (default: the 400-char chunk size) so chunks of
+    a large sheet keep their column context. Memory stays constant in sheet size.
+    """
     if not openpyxl:  # pragma: no cover
-        return []
+        return
+    budget = int(os.getenv("XLSX_BLOCK_CHARS", "400"))
+    try:
+        wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    except Exception:
+        return
     try:
-        wb = openpyxl.load_workbook(path, data_only=True)
-        out: List[str] = []
         for ws in wb.worksheets:
-            rows = []
-            for row in ws.iter_rows(values_only=True):
-                rows.append("\t".join(["" if v is None else str(v) for v in row]))
+            title = f"[Sheet:{ws.title}]"
+            header = None
+            rows: List[str] = []
+            size = 0
+            for values in ws.iter_rows(values_only=True):
+                line = _row_text(values)
+                if not line:
+                    continue
+                if header is None:
+                    header = line
+                    continue
+                if rows and size + len(line) + 1 > budget:
+                    yield "\n".join([title, header, *rows])
+                    rows = []
+                if not rows:
+                    size = len(title) + len(header) + 2
+                rows.append(line)
+                size += len(line) + 1
             if rows:
-                out.append(f"[Sheet:{ws.title}]\n" + "\n".join(rows))
-        return out
+                yield "\n".join([title, header, *rows])  # type: ignore[list-item]
+            elif header is not None:
+                # Single-row sheet
+                yield f"{title}\n{header}"
     except Exception:
-        return []
+        return
+    finally:
+        wb.close()
+
+
+def parse_xlsx(path: str) -> List[str]:
+    """Parse an Excel file into header-prefixed sheet row blocks."""
+    return list(iter_xlsx_blocks(path))
@@ -5,11 +5,16 @@ import threading
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import Response
-from pydantic import BaseModel
-
-from app.search_adapter.hybrid import hybrid_search as do_hybrid
-from app.models.llm_client import LLMClient
+from pydantic import BaseModel, ConfigDict, Field
+
+from app.search_adapter.hybrid import cached_hybrid_search as do_hybrid, is_degraded
+from app.search_adapter import result_cache
+from app.search_adapter.llm_enhanced import llm_rerank_stats
+from app.models.llm_client import LLMClient, aclose_clients, close_clients
+from app.models.embeddings import query_batcher_stats
+from app.models.reranker import rerank_cache_stats, warmup as rerank_warmup
 from app.utils.policy import enforce_policy
+from app.utils import answer_cache
 from app.utils.answer_enhancement import enhance_answer_quality, add_contextual_info
 import os
 import json
@@ -88,6 +93,19 @@ async def _ensure_vec_collection():  # pragma: no cover
         pass
 
 
+@app.on_event("startup")
+async def _warmup_reranker():  # pragma: no cover
+    # Load and exercise the cross-encoder before serving (off the event loop)
+    if _os.getenv("RERANK_WARMUP", "1") == "1":
+        await asyncio.get_running_loop().run_in_executor(None, rerank_warmup)
+
+
+@app.on_event("shutdown")
+async def _close_llm_clients():  # pragma: no cover
+    close_clients()
+    await aclose_clients()
+
+
 @app.get("/health")
 def health() -> dict:
     return {"status": "ok"}
@@ -95,7 +113,7 @@ def health() -> dict:
 
 @app.post("/search/hybrid", response_model=SearchResponse)
 def hybrid_search(req: SearchRequest) -> SearchResponse:
-    rows = do_hybrid(req.query, top_k=req.top_k, filters=req.filters or {})
+    rows = do_hybrid("/search/hybrid", req.query, top_k=req.top_k, filters=req.filters or {})
     results = [
         SearchResult(
             id=r["id"],
@@ -237,11 +255,26 @@ def _get_query_type_hints(query: str) -> str:
         return "질의에 대해 핵심 내용을 우선 제시하고, 필요시 세부사항을 보완하세요."
 
 
+class RerankOptions(BaseModel):
+    """Per-request rerank budget overrides (see app.models.reranker._settings).
+
+    Out-of-range values are rejected with a 422; unknown keys are ignored.
+    """
+    model_config = ConfigDict(extra="ignore")
+    depth: int | None = Field(None, ge=0, le=1000)
+    budget_ms: float | None = Field(None, ge=0, le=60000)
+    skip_gap: float | None = Field(None, ge=0, le=1)
+    cascade_band: int | None = Field(None, ge=0, le=1000)
+    batch: int | None = Field(None, ge=1, le=512)
+    use_cache: int | None = Field(None, ge=0, le=1)
+
+
 class DebugSearchRequest(BaseModel):
     query: str
     top_k: int = 8
     filters: Dict[str, Any] | None = None
     model: str | None = None
+    rerank: RerankOptions | None = None  # rerank budget overrides
 
 class DebugSearchResponse(BaseModel):
     query: str
@@ -249,6 +282,7 @@ class DebugSearchResponse(BaseModel):
     citations: List[Dict[str, Any]]
     context: str
     final_query: str
+    timings: Dict[str, Any] = {}
 
 @app.post("/debug/search", response_model=DebugSearchResponse)
 def debug_search(req: DebugSearchRequest) -> DebugSearchResponse:
@@ -256,8 +290,14 @@ def debug_search(req: DebugSearchRequest) -> DebugSearchResponse:
     query = req.query
     smalltalk = _is_smalltalk(query)
     
-    # 1. 하이브리드 검색 수행
-    hits = [] if smalltalk else do_hybrid(query, top_k=max(10, req.top_k), filters=req.filters or {}, model=req.model)
+    # 1. 하이브리드 검색 수행 (검색 단계별 소요 시간 포함)
+    timings: Dict[str, Any] = {}
+    hits = [] if smalltalk else do_hybrid("/debug/search", query, top_k=max(10, req.top_k), filters=req.filters or {}, model=req.model, stats=timings, rerank_options=req.rerank.model_dump(exclude_none=True) if req.rerank else None)
+    timings["embed_batcher"] = query_batcher_stats()
+    timings["rerank_cache"] = rerank_cache_stats()
+    timings["answer_cache"] = answer_cache.stats()
+    timings["search_cache"] = result_cache.stats()
+    timings["llm_rerank"] = llm_rerank_stats()
     
     # 2. Citations 생성  
     cits = [] if smalltalk else _dedupe_citations(hits, query=query)
@@ -285,7 +325,8 @@ def debug_search(req: DebugSearchRequest) -> DebugSearchResponse:
         hits=hits[:5],  # 상위 5개만 반환
         citations=cits,
         context=ctx,
-        final_query=final_user
+        final_query=final_user,
+        timings=timings,
     )
 
 @app.post("/rag/query", response_model=RagResponse)
@@ -293,9 +334,24 @@ def rag_query(req: RagRequest) -> RagResponse:
     mode = req.mode
     if mode == "auto":
         mode = "table" if _detect_table_mode(req.query) else "normal"
+    # Answer cache (skipped for multi-turn chats: history changes the answer)
+    cache_scope = None
+    cache_generation = None
+    if not req.history:
+        cache_scope = answer_cache.scope_key(
+            filters=req.filters or {}, model=req.model or "", mode=mode, top_k=req.top_k, enforce_policy=req.enforce_policy
+        )
+        cached = answer_cache.lookup(req.query, cache_scope)
+        if cached is not None:
+            return RagResponse(answer=cached["answer"], citations=cached["citations"], policy=cached["policy"])
+        # Read before retrieval: an index write during this request makes the answer unsafe to store
+        cache_generation = result_cache.index_generation()
+
     smalltalk = _is_smalltalk(req.query)
-    hits = [] if smalltalk else do_hybrid(req.query, top_k=max(10, req.top_k), filters=req.filters or {}, model=req.model)
+    search_stats: Dict[str, Any] = {}
+    hits = [] if smalltalk else do_hybrid("/rag/query", req.query, top_k=max(10, req.top_k), filters=req.filters or {}, model=req.model, stats=search_stats)
     cits = [] if smalltalk else _dedupe_citations(hits, query=req.query)
+    context_post_ids = [c.get("post_id") for c in cits]
     ctx = "\n\n".join([f"[{i+1}] {c['snippet']}" for i, c in enumerate(cits)])
 
     # Compose prompt (LLM stubbed for now)
@@ -347,6 +403,17 @@ def rag_query(req: RagRequest) -> RagResponse:
             # On refusal, strip citations to avoid leaking sensitive refs
             cits = []
 
+    # Skip storing smalltalk, answers without sources, answers built from degraded retrieval
+    # or from an index that changed underneath us (the worker's invalidate_posts may already have run for it)
+    if (
+        cache_scope is not None
+        and not smalltalk
+        and cits
+        and cache_generation is not None
+        and not is_degraded(search_stats)
+        and result_cache.index_generation() == cache_generation
+    ):
+        answer_cache.store(req.query, cache_scope, answer=answer, citations=cits, policy=policy, post_ids=context_post_ids)
     return RagResponse(answer=answer, citations=cits, policy=policy)
 
 
@@ -360,8 +427,13 @@ async def rag_stream(req: RagRequest):
         mode = "table" if _detect_table_mode(req.query) else "normal"
 
     smalltalk = _is_smalltalk(req.query)
-    hits = [] if smalltalk else do_hybrid(req.query, top_k=max(10, req.top_k), filters=req.filters or {}, model=req.model)
-    cits = [] if smalltalk else _dedupe_citations(hits, query=req.query)
+
+    def _retrieve() -> List[Dict[str, Any]]:
+        hits = do_hybrid("/rag/stream", req.query, top_k=max(10, req.top_k), filters=req.filters or {}, model=req.model)
+        return _dedupe_citations(hits, query=req.query)
+
+    # Retrieval (embedding, BM25, rerank) is blocking; keep it off the event loop
+    cits = [] if smalltalk else await asyncio.to_thread(_retrieve)
     ctx = "\n\n".join([f"[{i+1}] {c['snippet']}" for i, c in enumerate(cits)])
 
     client = LLMClient(model=req.model or None)
@@ -395,7 +467,7 @@ async def rag_stream(req: RagRequest):
         async with _llm_sem_async:
             yield "event: start\n\n"
             try:
-                for delta in client.chat_stream(convo):
+                async for delta in client.achat_stream(convo):
                     if not delta:
                         continue
                     yield f"data: {delta}\n\n"
@@ -1,5 +1,8 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
 from datetime import datetime
-from typing import List, Tuple, Dict, Any, Optional
+from typing import List, Tuple, Dict, Any, Optional, Callable
 
 import os as _os
 if _os.getenv("IR_BACKEND", "sqlite").lower() == "opensearch":
@@ -8,7 +11,9 @@ else:
     from .sqlite_fts import bm25_search
 from .qdrant_vec import vector_search
 from .rrf import rrf
-from app.models.reranker import rerank
+from app.models.reranker import rerank, rerank_depth
+from app.utils.answer_cache import normalize_query
+from . import result_cache
 
 
 def _recency_boost(date_str: str) -> float:
@@ -41,19 +46,146 @@ def _pass_filters(payload: Dict[str, Any], filters: Dict[str, Any]) -> bool:
     return True
 
 
-def hybrid_search(query: str, top_k: int = 20, filters: Optional[Dict[str, Any]] = None, model: Optional[str] = None) -> List[Dict[str, Any]]:
-    # 분리된 검색 전략: OpenSearch(게시글) + Qdrant(첨부파일)
-    import os as _os
+_retrieval_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+# Branches that missed their deadline but are still running, by branch name.
+# cancel() cannot stop a running call, so these keep holding pool workers.
+_stuck: Dict[str, int] = {}
+_stuck_lock = threading.Lock()
+
+
+def _get_retrieval_pool() -> ThreadPoolExecutor:
+    """Process-wide thread pool shared by all retrieval branches."""
+    global _retrieval_pool
+    if _retrieval_pool is None:
+        with _pool_lock:
+            if _retrieval_pool is None:
+                workers = int(_os.getenv("SEARCH_POOL_WORKERS", "8"))
+                _retrieval_pool = ThreadPoolExecutor(max_workers=max(2, workers), thread_name_prefix="retrieval")
+    return _retrieval_pool
+
+
+def _max_stuck() -> int:
+    return int(_os.getenv("SEARCH_BRANCH_MAX_STUCK", "1"))
+
+
+def _mark_stuck(name: str, fut: Future) -> None:
+    """Count a timed out branch as stuck until its call finally returns."""
+
+    def _release(_fut: Future) -> None:
+        with _stuck_lock:
+            left = _stuck.get(name, 0) - 1
+            if left > 0:
+                _stuck[name] = left
+            else:
+                _stuck.pop(name, None)
+
+    with _stuck_lock:
+        _stuck[name] = _stuck.get(name, 0) + 1
+    fut.add_done_callback(_release)  # runs at once if it already finished
+
+
+def _branch_timeout() -> float:
+    return float(_os.getenv("SEARCH_BRANCH_TIMEOUT", "20"))
+
+
+def _retrievers(
+    query: str, model: Optional[str] = None, degraded: Optional[List[str]] = None
+) -> Dict[str, Callable[[], List[Tuple[str, float, Dict[str, Any]]]]]:
+    """Build the retrieval branches to fan out (name -> zero-arg callable).
+
+    New retrievers only need to be added here; they run concurrently with the rest.
+    Branches append the stages they had to fall back on to ``degraded``.
+    """
     ir_backend = _os.getenv("IR_BACKEND", "sqlite").lower()
-    
-    # IR 백엔드가 disabled인 경우 BM25 검색 건너뛰기
-    if ir_backend == "disabled":
-        bm25 = []  # 빈 결과로 벡터 검색만 사용
-    elif ir_backend == "opensearch":
-        bm25 = bm25_search(query, top_k=30, model=model)  # OpenSearch - LLM 향상 적용
-    else:
-        bm25 = bm25_search(query, top_k=30)  # SQLite - 기본 검색
-    vec = vector_search(query, top_k=30)  # 첨부파일 검색
+    branches: Dict[str, Callable[[], List[Tuple[str, float, Dict[str, Any]]]]] = {}
+    # IR 백엔드가 disabled인 경우 BM25 검색 건너뛰기 (벡터 검색만 사용)
+    if ir_backend == "opensearch":
+        branches["bm25"] = lambda: bm25_search(query, top_k=30, model=model, degraded=degraded)  # OpenSearch - LLM 향상 적용
+    elif ir_backend != "disabled":
+        branches["bm25"] = lambda: bm25_search(query, top_k=30, degraded=degraded)  # SQLite - 기본 검색
+    branches["vector"] = lambda: vector_search(query, top_k=30, degraded=degraded)  # 첨부파일 검색
+    return branches
+
+
+def _timed(fn: Callable[[], List[Tuple[str, float, Dict[str, Any]]]]) -> Tuple[List[Tuple[str, float, Dict[str, Any]]], float]:
+    t0 = time.perf_counter()
+    out = fn()
+    return out, (time.perf_counter() - t0) * 1000.0
+
+
+def run_retrievers(
+    branches: Dict[str, Callable[[], List[Tuple[str, float, Dict[str, Any]]]]],
+    timeout: Optional[float] = None,
+) -> Tuple[Dict[str, List[Tuple[str, float, Dict[str, Any]]]], Dict[str, Any]]:
+    """Run retrieval branches concurrently under a shared deadline.
+
+    A branch that errors or misses the deadline contributes no hits instead of
+    failing the whole search. A timed out call cannot be interrupted and keeps a
+    pool worker until it returns; while SEARCH_BRANCH_MAX_STUCK calls of a
+    branch are stuck like that, the branch is skipped rather than piling more
+    workers onto a hung backend. Returns (results by branch, stats) where stats
+    holds per-branch timings in ms plus the names of timed out / failed / skipped
+    branches.
+    """
+    timeout = _branch_timeout() if timeout is None else timeout
+    t0 = time.perf_counter()
+    pool = _get_retrieval_pool()
+    results: Dict[str, List[Tuple[str, float, Dict[str, Any]]]] = {}
+    stats: Dict[str, Any] = {"timings_ms": {}, "timed_out": [], "errors": [], "skipped": []}
+    futures: Dict[str, Future] = {}
+    for name, fn in branches.items():
+        with _stuck_lock:
+            stuck = _stuck.get(name, 0)
+        if stuck >= max(1, _max_stuck()):
+            results[name] = []
+            stats["skipped"].append(name)
+            continue
+        futures[name] = pool.submit(_timed, fn)
+    deadline = t0 + timeout
+
+    for name, fut in futures.items():
+        try:
+            hits, elapsed = fut.result(timeout=max(0.0, deadline - time.perf_counter()))
+            results[name] = hits
+            stats["timings_ms"][name] = round(elapsed, 1)
+        except FutureTimeout:
+            if not fut.cancel():
+                _mark_stuck(name, fut)
+            results[name] = []
+            stats["timed_out"].append(name)
+            stats["timings_ms"][name] = round((time.perf_counter() - t0) * 1000.0, 1)
+        except Exception:
+            results[name] = []
+            stats["errors"].append(name)
+            stats["timings_ms"][name] = round((time.perf_counter() - t0) * 1000.0, 1)
+    stats["retrieval_ms"] = round((time.perf_counter() - t0) * 1000.0, 1)
+    return results, stats
+
+
+def hybrid_search(
+    query: str,
+    top_k: int = 20,
+    filters: Optional[Dict[str, Any]] = None,
+    model: Optional[str] = None,
+    stats: Optional[Dict[str, Any]] = None,
+    rerank_options: Optional[Dict[str, Any]] = None,
+) -> List[Dict[str, Any]]:
+    """Hybrid search: board posts (BM25) + attachments (vector), then rerank.
+
+    If ``stats`` is given it is filled with per-branch retrieval timings, the
+    stages that fell back (``degraded``) and what the rerank stage did.
+    ``rerank_options`` overrides the rerank budget (depth, budget_ms, skip_gap,
+    cascade_band) for this call.
+    """
+    # 분리된 검색 전략: OpenSearch(게시글) + Qdrant(첨부파일) — 두 검색을 동시에 실행
+    degraded: List[str] = []
+    retrieved, retrieval_stats = run_retrievers(_retrievers(query, model, degraded))
+    if stats is not None:
+        stats.update(retrieval_stats)
+        stats["degraded"] = degraded
+    bm25 = retrieved.get("bm25", [])
+    vec = retrieved.get("vector", [])
 
     # 게시글 검색 결과 처리 (OpenSearch/SQLite)
     board_results = []
@@ -78,8 +210,12 @@ def hybrid_search(query: str, top_k: int = 20, filters: Optional[Dict[str, Any]]
     all_candidates.sort(key=lambda x: x[1], reverse=True)
     
     # 상위 후보들에 대해 재랭킹 적용
-    rerank_input = [(doc_id, score, text) for doc_id, score, text, _, _ in all_candidates[:max(40, top_k*2)]]
-    reranked = rerank(query, rerank_input, top_k=top_k)
+    depth = rerank_depth(top_k, rerank_options)
+    rerank_input = [(doc_id, score, text) for doc_id, score, text, _, _ in all_candidates[:depth]]
+    t_rerank = time.perf_counter()
+    reranked = rerank(query, rerank_input, top_k=top_k, stats=stats, options=rerank_options)
+    if stats is not None:
+        stats["rerank_ms"] = round((time.perf_counter() - t_rerank) * 1000.0, 1)
     
     # 원본 payload 정보 복원 및 결과 구성
     id_to_payload = {doc_id: (payload, source_type) for doc_id, _, _, payload, source_type in all_candidates}
@@ -112,3 +248,60 @@ def hybrid_search(query: str, top_k: int = 20, filters: Optional[Dict[str, Any]]
             "source_type": source_type,  # 구분용 추가 필드
         })
     return results
+
+
+def is_degraded(stats: Dict[str, Any]) -> bool:
+    """Whether a search filled into ``stats`` took any fallback path.
+
+    Timed out, failed or skipped branches, LLM expansion/rerank fallbacks and a cross
+    encoder that was missing or ran out of budget all mean a later identical
+    request may well get a better answer, so such results must not be cached.
+    """
+    if stats.get("timed_out") or stats.get("errors") or stats.get("skipped") or stats.get("degraded"):
+        return True
+    info = stats.get("rerank") or {}
+    return info.get("mode") == "fallback" or bool(info.get("budget_exhausted"))
+
+
+def cached_hybrid_search(
+    endpoint: str,
+    query: str,
+    top_k: int = 20,
+    filters: Optional[Dict[str, Any]] = None,
+    model: Optional[str] = None,
+    stats: Optional[Dict[str, Any]] = None,
+    rerank_options: Optional[Dict[str, Any]] = None,
+) -> List[Dict[str, Any]]:
+    """``hybrid_search`` behind the index-generation result cache.
+
+    Keyed by (normalized query, filters, top_k, backends, model) plus the
+    current index generation. ``endpoint`` labels the hit/miss counters.
+    Requests with rerank overrides are experiments and always run uncached,
+    and degraded results (see ``is_degraded``) are returned but never stored.
+    """
+    gen = result_cache.index_generation() if _os.getenv("SEARCH_CACHE", "1") == "1" and not rerank_options else None
+    if gen is None:
+        return hybrid_search(query, top_k=top_k, filters=filters, model=model, stats=stats, rerank_options=rerank_options)
+    key = result_cache.make_key(
+        gen,
+        query=normalize_query(query),
+        filters=filters or {},
+        top_k=top_k,
+        ir_backend=_os.getenv("IR_BACKEND", "sqlite").lower(),
+        embed_backend=_os.getenv("EMBED_BACKEND", ""),
+        rerank=_os.getenv("USE_RERANK", "1") + _os.getenv("RERANK_BACKEND", "st"),
+        model=model or "",
+    )
+    rows = result_cache.get(key, endpoint)
+    if rows is not None:
+        if stats is not None:
+            stats["result_cache"] = "hit"
+        return rows
+    search_stats: Dict[str, Any] = {}
+    rows = hybrid_search(query, top_k=top_k, filters=filters, model=model, stats=search_stats)
+    if not is_degraded(search_stats):
+        result_cache.put(key, rows)
+    if stats is not None:
+        stats.update(search_stats)
+        stats["result_cache"] = "miss"
+    return rows
@@ -4,10 +4,17 @@
 - 의도 분석 (질문 유형 분류)
 - 컨텍스트 기반 검색 최적화
 """
-from typing import List, Dict, Any, Optional
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import List, Dict, Any, Optional, Tuple
+import hashlib
+import os
 import re
+import threading
+import time
 
 from app.models.llm_client import LLMClient
+from app.utils.answer_cache import normalize_query
 
 
 def _classify_query_intent(query: str) -> Dict[str, Any]:
@@ -54,8 +61,48 @@ def _extract_domain_keywords(query: str) -> List[str]:
     return list(set(expanded))
 
 
-def expand_query_with_llm(query: str, model: Optional[str] = None) -> Dict[str, Any]:
-    """LLM을 활용한 쿼리 확장"""
+# 쿼리 확장 캐시: (model, 정규화 쿼리) -> (저장 시각, LLM 분석 결과)
+_expand_cache: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+_expand_inflight: Dict[str, Future] = {}
+# 키별로 아직 결과를 기다리는 요청 수 (0이면 시작 전 작업은 버림)
+_expand_waiters: Dict[str, int] = {}
+_expand_lock = threading.Lock()
+_expand_pool: Optional[ThreadPoolExecutor] = None
+_expand_counts = {"cache": 0, "llm": 0, "timeout": 0, "failed": 0, "rejected": 0, "dropped": 0}
+
+
+def expand_timeout() -> float:
+    return float(os.getenv("LLM_EXPAND_TIMEOUT_MS", "1500")) / 1000.0
+
+
+def _expand_key(query: str, model: Optional[str]) -> str:
+    return f"{model or os.getenv('LLM_MODEL', '')}\n{normalize_query(query)}"
+
+
+def _get_expand_pool() -> ThreadPoolExecutor:
+    global _expand_pool
+    with _expand_lock:
+        if _expand_pool is None:
+            workers = int(os.getenv("LLM_EXPAND_WORKERS", "4"))
+            _expand_pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="llm-expand")
+        return _expand_pool
+
+
+def _rule_based_expansion(query: str) -> Dict[str, Any]:
+    """규칙 기반 쿼리 분석 (LLM 실패/시간 초과시 사용)"""
+    intent_info = _classify_query_intent(query)
+    domain_keywords = _extract_domain_keywords(query)
+
+    return {
+        "keywords": [query] + domain_keywords,
+        "intent": intent_info["type"],
+        "category_hints": _guess_categories(query),
+        "expanded_query": query + " " + " ".join(domain_keywords),
+        "field_weights": intent_info["weight"]
+    }
+
+
+def _llm_expand(query: str, model: Optional[str]) -> Optional[Dict[str, Any]]:
     client = LLMClient(model=model)
     
     # LLM에게 쿼리 분석 요청
@@ -79,21 +126,114 @@ def expand_query_with_llm(query: str, model: Optional[str] = None) -> Dict[str,
         if response and response.strip().startswith("{"):
             import json
             result = json.loads(response.strip())
-            return result
+            if isinstance(result, dict):
+                return result
     except Exception:
         pass
-    
-    # LLM 실패시 규칙 기반 폴백
-    intent_info = _classify_query_intent(query)
-    domain_keywords = _extract_domain_keywords(query)
-    
-    return {
-        "keywords": [query] + domain_keywords,
-        "intent": intent_info["type"],
-        "category_hints": _guess_categories(query),
-        "expanded_query": query + " " + " ".join(domain_keywords),
-        "field_weights": intent_info["weight"]
-    }
+    return None
+
+
+def _run_expansion(key: str, query: str, model: Optional[str]) -> Optional[Dict[str, Any]]:
+    try:
+        with _expand_lock:
+            if _expand_waiters.get(key, 0) <= 0:
+                # 대기열에 있는 동안 모든 요청이 포기함: LLM 호출 생략
+                _expand_counts["dropped"] += 1
+                return None
+        result = _llm_expand(query, model)
+        with _expand_lock:
+            if result is None:
+                _expand_counts["failed"] += 1
+            else:
+                _expand_counts["llm"] += 1
+                _expand_cache[key] = (time.time(), result)
+                _expand_cache.move_to_end(key)
+                while len(_expand_cache) > int(os.getenv("LLM_EXPAND_CACHE_SIZE", "2048")):
+                    _expand_cache.popitem(last=False)
+        return result
+    finally:
+        with _expand_lock:
+            _expand_inflight.pop(key, None)
+            _expand_waiters.pop(key, None)
+
+
+def _finished(result: Optional[Dict[str, Any]]) -> Future:
+    done: Future = Future()
+    done.set_result(result)
+    return done
+
+
+def start_expansion(query: str, model: Optional[str] = None) -> Future:
+    """LLM 쿼리 확장을 백그라운드로 시작 (캐시 적중시 완료된 Future 반환).
+
+    같은 쿼리의 동시 요청은 하나의 LLM 호출을 공유하고, 실행이 시작된 뒤
+    시간 초과된 호출도 끝나면 캐시에 저장되어 다음 요청에서 사용됩니다.
+    진행 중인 확장이 LLM_EXPAND_MAX_QUEUE개면 새 쿼리는 바로 None으로 끝납니다.
+    """
+    key = _expand_key(query, model)
+    ttl = float(os.getenv("LLM_EXPAND_CACHE_TTL", "3600"))
+    pool = _get_expand_pool()
+    with _expand_lock:
+        hit = _expand_cache.get(key)
+        if hit is not None and time.time() - hit[0] < ttl:
+            _expand_cache.move_to_end(key)
+            _expand_counts["cache"] += 1
+            return _finished(hit[1])
+        fut = _expand_inflight.get(key)
+        if fut is None:
+            if len(_expand_inflight) >= int(os.getenv("LLM_EXPAND_MAX_QUEUE", "32")):
+                _expand_counts["rejected"] += 1
+                return _finished(None)
+            # Registered under the lock, so _run_expansion's cleanup always runs after it
+            _expand_waiters[key] = 0
+            fut = pool.submit(_run_expansion, key, query, model)
+            _expand_inflight[key] = fut
+        _expand_waiters[key] += 1
+        return fut
+
+
+def wait_expansion(fut: Future, timeout: float) -> Optional[Dict[str, Any]]:
+    """확장 결과를 최대 timeout초 기다림 (시간 초과/실패시 None)."""
+    try:
+        result = fut.result(timeout=max(0.0, timeout))
+    except FutureTimeout:
+        with _expand_lock:
+            _expand_counts["timeout"] += 1
+            for key, inflight in _expand_inflight.items():
+                if inflight is fut:
+                    _expand_waiters[key] -= 1
+                    break
+        return None
+    except Exception:
+        return None
+    return dict(result) if result else None
+
+
+def expansion_stats() -> Dict[str, int]:
+    with _expand_lock:
+        return {**_expand_counts, "cached": len(_expand_cache)}
+
+
+def expand_query_with_llm(
+    query: str,
+    model: Optional[str] = None,
+    timeout: Optional[float] = None,
+    degraded: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """LLM을 활용한 쿼리 확장
+
+    결과는 정규화 쿼리별로 캐시되며(LLM_EXPAND_CACHE_SIZE/TTL), LLM 응답을
+    LLM_EXPAND_TIMEOUT_MS 이상 기다리지 않고 규칙 기반 분석으로 대체합니다.
+    규칙 기반으로 대체한 경우 ``degraded``(주어진 경우)에 "llm_expand"를 추가합니다.
+    """
+    fut = start_expansion(query, model)
+    result = wait_expansion(fut, expand_timeout() if timeout is None else timeout)
+    if result is not None:
+        return result
+    # LLM 실패/시간 초과시 규칙 기반 폴백
+    if degraded is not None:
+        degraded.append("llm_expand")
+    return _rule_based_expansion(query)
 
 
 def _guess_categories(query: str) -> List[str]:
@@ -187,46 +327,262 @@ def build_enhanced_opensearch_query(original_query: str, llm_analysis: Dict[str,
     return query_body
 
 
-def semantic_search_rerank(query: str, candidates: List[Dict[str, Any]], model: Optional[str] = None) -> List[Dict[str, Any]]:
-    """LLM을 활용한 의미적 재랭킹"""
-    if not candidates or len(candidates) <= 2:
-        return candidates
-    
-    client = LLMClient(model=model)
-    
+# LLM 재랭킹: (model, 정규화 쿼리, 문서 id 집합) -> (저장 시각, 문서 id 순서)
+_rerank_cache: "OrderedDict[str, Tuple[float, List[str]]]" = OrderedDict()
+_rerank_lock = threading.Lock()
+_rerank_pool: Optional[ThreadPoolExecutor] = None
+_rerank_counts = {"cache": 0, "llm": 0, "timeout": 0, "failed": 0, "rejected": 0, "dropped": 0, "batched_prompts": 0, "total_ms": 0.0}
+
+try:
+    from prometheus_client import Histogram
+
+    _RERANK_SECONDS = Histogram(  # type: ignore
+        "llm_rerank_seconds", "Time the LLM rerank stage added to a search", ["result"],
+        buckets=(0.005, 0.05, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0),
+    )
+except Exception:  # pragma: no cover
+    _RERANK_SECONDS = None
+
+
+def _get_rerank_pool() -> ThreadPoolExecutor:
+    global _rerank_pool
+    with _rerank_lock:
+        if _rerank_pool is None:
+            workers = int(os.getenv("LLM_RERANK_WORKERS", "2"))
+            _rerank_pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="llm-rerank")
+        return _rerank_pool
+
+
+def _doc_id(doc: Dict[str, Any], i: int) -> str:
+    return str(doc.get("id") or doc.get("post_id") or i)
+
+
+def _docs_summary(docs: List[Dict[str, Any]]) -> str:
     # 후보 문서들을 텍스트로 변환
     docs_text = []
-    for i, doc in enumerate(candidates[:10]):  # 상위 10개만 처리
+    for i, doc in enumerate(docs):
         title = doc.get("title", "")
         snippet = doc.get("snippet", "")
         text = f"[문서{i+1}] 제목: {title}\n내용: {snippet}"
         docs_text.append(text)
-    
-    docs_summary = "\n\n".join(docs_text)
-    
+    return "\n\n".join(docs_text)
+
+
+def _parse_order(order_str: str, n: int) -> Optional[List[int]]:
+    """"1,3,2,..." -> 0-based 문서 순서 (중복/범위 밖 번호 제거)"""
+    order_str = order_str.strip()
+    if not re.match(r'^[\d,\s]+$', order_str):
+        return None
+    order: List[int] = []
+    for x in order_str.split(","):
+        x = x.strip()
+        if x.isdigit() and 0 <= int(x) - 1 < n and int(x) - 1 not in order:
+            order.append(int(x) - 1)
+    return order or None
+
+
+def _rerank_one(client: LLMClient, query: str, docs: List[Dict[str, Any]]) -> Optional[List[int]]:
     prompt = f"""
 다음은 "{query}" 질의에 대한 검색 결과들입니다. 
-질의와의 관련성을 기준으로 1-10 순서로 재정렬해주세요.
+질의와의 관련성을 기준으로 1-{len(docs)} 순서로 재정렬해주세요.
 
-{docs_summary}
+{_docs_summary(docs)}
 
 응답 형식: 1,3,2,5,4,... (번호만 쉼표로 구분)
 """
-    
+    response = client.chat([{"role": "user", "content": prompt}])
+    return _parse_order(response, len(docs)) if response else None
+
+
+def _rerank_many(client: LLMClient, jobs: List[Tuple[str, List[Dict[str, Any]]]]) -> List[Optional[List[int]]]:
+    """여러 요청의 재랭킹을 한 번의 LLM 호출로 처리 (질의별 한 줄씩 응답)."""
+    sections = [
+        f"### Q{j+1}: \"{query}\"\n{_docs_summary(docs)}" for j, (query, docs) in enumerate(jobs)
+    ]
+    prompt = (
+        "다음은 여러 질의와 각 질의의 검색 결과들입니다. 질의마다 관련성을 기준으로 문서 번호를 재정렬해주세요.\n\n"
+        + "\n\n".join(sections)
+        + "\n\n응답 형식: 질의마다 한 줄씩 'Q1: 1,3,2,...' (다른 설명 없이)\n"
+    )
+    response = client.chat([{"role": "user", "content": prompt}]) or ""
+    orders: List[Optional[List[int]]] = [None] * len(jobs)
+    for line in response.splitlines():
+        m = re.match(r'^\s*Q(\d+)\s*[:：]\s*(.+)$', line)
+        if m and 0 <= int(m.group(1)) - 1 < len(jobs):
+            j = int(m.group(1)) - 1
+            orders[j] = _parse_order(m.group(2), len(jobs[j][1]))
+    return orders
+
+
+def _store_order(key: str, docs: List[Dict[str, Any]], order: Optional[List[int]]) -> None:
+    if order is None:
+        return
+    with _rerank_lock:
+        _rerank_cache[key] = (time.time(), [_doc_id(docs[i], i) for i in order])
+        _rerank_cache.move_to_end(key)
+        while len(_rerank_cache) > int(os.getenv("LLM_RERANK_CACHE_SIZE", "2048")):
+            _rerank_cache.popitem(last=False)
+
+
+class _RerankBatcher:
+    """동시 재랭킹 요청을 모아 한 번의 LLM 호출로 처리.
+
+    첫 요청 후 LLM_RERANK_BATCH_WINDOW_MS 동안(최대 LLM_RERANK_BATCH_MAX개) 같은
+    모델의 요청을 모으고, 묶음 프롬프트를 재랭킹 스레드 풀에서 실행합니다.
+    대기 중/실행 중 요청이 LLM_RERANK_MAX_QUEUE개면 새 요청은 거절(None)되고,
+    호출자가 시간 초과로 취소한 요청은 LLM 호출 전에 버려집니다.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._pending: List[Tuple[str, str, List[Dict[str, Any]], Optional[str], Future]] = []
+        self._timer: Optional[threading.Timer] = None
+        self._outstanding = 0
+
+    def submit(self, key: str, query: str, docs: List[Dict[str, Any]], model: Optional[str]) -> Optional[Future]:
+        fut: Future = Future()
+        with self._lock:
+            if self._outstanding >= int(os.getenv("LLM_RERANK_MAX_QUEUE", "32")):
+                return None
+            self._outstanding += 1
+            self._pending.append((key, query, docs, model, fut))
+            if len(self._pending) >= int(os.getenv("LLM_RERANK_BATCH_MAX", "1")):
+                self._flush_locked()
+            elif self._timer is None:
+                window = float(os.getenv("LLM_RERANK_BATCH_WINDOW_MS", "20")) / 1000.0
+                self._timer = threading.Timer(window, self._flush)
+                self._timer.daemon = True
+                self._timer.start()
+        return fut
+
+    def done(self, n: int) -> None:
+        with self._lock:
+            self._outstanding -= n
+
+    def _flush(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        by_model: Dict[Optional[str], List[Tuple[str, str, List[Dict[str, Any]], Optional[str], Future]]] = {}
+        for job in batch:
+            by_model.setdefault(job[3], []).append(job)
+        for model, jobs in by_model.items():
+            _get_rerank_pool().submit(_run_rerank_jobs, model, jobs)
+
+
+def _run_rerank_jobs(model: Optional[str], jobs: List[Tuple[str, str, List[Dict[str, Any]], Optional[str], Future]]) -> None:
     try:
-        response = client.chat([{"role": "user", "content": prompt}])
-        if response:
-            # 순서 파싱
-            order_str = response.strip()
-            if re.match(r'^[\d,\s]+$', order_str):
-                order_indices = [int(x.strip()) - 1 for x in order_str.split(",") if x.strip().isdigit()]
-                # 유효한 인덱스만 필터링
-                valid_indices = [i for i in order_indices if 0 <= i < len(candidates)]
-                reranked = [candidates[i] for i in valid_indices]
-                # 누락된 문서들을 뒤에 추가
-                remaining = [doc for i, doc in enumerate(candidates) if i not in valid_indices]
-                return reranked + remaining
-    except Exception:
-        pass
-    
-    return candidates
\ No newline at end of file
+        # 이미 포기(취소)된 요청은 LLM에 보내지 않음
+        live = [job for job in jobs if job[4].set_running_or_notify_cancel()]
+        if len(live) < len(jobs):
+            with _rerank_lock:
+                _rerank_counts["dropped"] += len(jobs) - len(live)
+        if not live:
+            return
+        client = LLMClient(model=model)
+        try:
+            if len(live) == 1:
+                orders = [_rerank_one(client, live[0][1], live[0][2])]
+            else:
+                orders = _rerank_many(client, [(query, docs) for _k, query, docs, _m, _f in live])
+                with _rerank_lock:
+                    _rerank_counts["batched_prompts"] += 1
+        except Exception:
+            orders = [None] * len(live)
+        for (key, _q, docs, _m, fut), order in zip(live, orders):
+            # 실행이 시작된 뒤 시간 초과된 요청의 결과도 캐시해 다음 요청에서 사용
+            _store_order(key, docs, order)
+            fut.set_result(order)
+    finally:
+        _rerank_batcher.done(len(jobs))
+
+
+_rerank_batcher = _RerankBatcher()
+
+
+def llm_rerank_stats() -> Dict[str, Any]:
+    """LLM 재랭킹 단계 통계 (캐시/LLM/시간 초과 횟수, 평균 추가 지연)."""
+    with _rerank_lock:
+        st = dict(_rerank_counts)
+        st["cached"] = len(_rerank_cache)
+    calls = st["cache"] + st["llm"] + st["timeout"] + st["failed"] + st["rejected"]
+    st["avg_ms"] = round(st.pop("total_ms") / calls, 1) if calls else 0.0
+    return st
+
+
+def _record_rerank(result: str, t0: float) -> None:
+    elapsed = time.perf_counter() - t0
+    with _rerank_lock:
+        _rerank_counts["total_ms"] += elapsed * 1000.0
+        _rerank_counts[result] += 1
+    if _RERANK_SECONDS is not None:
+        _RERANK_SECONDS.labels(result=result).observe(elapsed)
+
+
+def semantic_search_rerank(
+    query: str,
+    candidates: List[Dict[str, Any]],
+    model: Optional[str] = None,
+    degraded: Optional[List[str]] = None,
+) -> List[Dict[str, Any]]:
+    """LLM을 활용한 의미적 재랭킹
+
+    상위 10개 후보의 순서를 (모델, 정규화 쿼리, 문서 id 집합)별로 캐시하고,
+    LLM 응답은 LLM_RERANK_TIMEOUT_MS까지만 기다립니다(초과시 원래 순서).
+    LLM_RERANK_BATCH_MAX > 1이면 동시 요청들을 한 프롬프트로 묶어 처리합니다.
+    원래 순서로 대체한 경우 ``degraded``(주어진 경우)에 "llm_rerank"를 추가합니다.
+    """
+    if not candidates or len(candidates) <= 2:
+        return candidates
+
+    t0 = time.perf_counter()
+    head = candidates[:10]  # 상위 10개만 처리
+    ids = [_doc_id(d, i) for i, d in enumerate(head)]
+    key_src = f"{model or os.getenv('LLM_MODEL', '')}\n{normalize_query(query)}\n" + "\n".join(sorted(ids))
+    key = hashlib.sha1(key_src.encode("utf-8")).hexdigest()
+
+    ordered_ids: Optional[List[str]] = None
+    ttl = float(os.getenv("LLM_RERANK_CACHE_TTL", "3600"))
+    with _rerank_lock:
+        hit = _rerank_cache.get(key)
+        if hit is not None and time.time() - hit[0] < ttl:
+            _rerank_cache.move_to_end(key)
+            ordered_ids = hit[1]
+    if ordered_ids is not None:
+        _record_rerank("cache", t0)
+        # 캐시에는 id 순서만 있으므로 위치로 되돌림 (같은 id가 여러 번 나오면 앞에서부터 하나씩)
+        positions: Dict[str, List[int]] = {}
+        for i, doc_id in enumerate(ids):
+            positions.setdefault(doc_id, []).append(i)
+        order = [positions[doc_id].pop(0) for doc_id in ordered_ids if positions.get(doc_id)]
+    else:
+        fut = _rerank_batcher.submit(key, query, head, model)
+        if fut is None:
+            # 재랭킹 대기열이 가득 참: 기다리지 않고 원래 순서 사용
+            _record_rerank("rejected", t0)
+            if degraded is not None:
+                degraded.append("llm_rerank")
+            return candidates
+        try:
+            order = fut.result(timeout=float(os.getenv("LLM_RERANK_TIMEOUT_MS", "2000")) / 1000.0)
+        except FutureTimeout:
+            fut.cancel()  # 아직 LLM에 보내지 않았다면 버려짐
+            _record_rerank("timeout", t0)
+            if degraded is not None:
+                degraded.append("llm_rerank")
+            return candidates
+        _record_rerank("llm" if order else "failed", t0)
+        if not order:
+            if degraded is not None:
+                degraded.append("llm_rerank")
+            return candidates
+
+    # 누락된 문서들을 뒤에 추가
+    used = set(order)
+    remaining = [i for i in range(len(head)) if i not in used]
+    return [head[i] for i in order + remaining] + candidates[10:]
@@ -1,40 +1,57 @@
 import os
-from typing import List, Tuple, Dict, Any
+import time
+from typing import List, Tuple, Dict, Any, Optional
 
-from .llm_enhanced import expand_query_with_llm, build_enhanced_opensearch_query, semantic_search_rerank
+from .llm_enhanced import (
+    expand_query_with_llm,
+    build_enhanced_opensearch_query,
+    semantic_search_rerank,
+    start_expansion,
+    wait_expansion,
+    expand_timeout,
+)
 
 
 def _client():
-    try:
-        from opensearchpy import OpenSearch  # type: ignore
-    except Exception as e:  # pragma: no cover
-        raise RuntimeError("opensearch-py not installed") from e
-    url = os.getenv("OPENSEARCH_URL", "http://opensearch:9200")
-    user = os.getenv("OPENSEARCH_USER")
-    password = os.getenv("OPENSEARCH_PASSWORD")
-    http_auth = (user, password) if user and password else None
-    # Simple URL host string works in opensearch-py
-    return OpenSearch(hosts=[url], http_auth=http_auth, verify_certs=False, ssl_show_warn=False)
+    # Shared pooled client (one per process), also used by the indexer
+    from app.indexer.index_opensearch import get_client
+
+    return get_client()
 
 
-def bm25_search(query: str, top_k: int = 50, model: str = None, use_llm_enhancement: bool = True) -> List[Tuple[str, float, Dict[str, Any]]]:
+def bm25_search(
+    query: str,
+    top_k: int = 50,
+    model: str = None,
+    use_llm_enhancement: bool = True,
+    degraded: Optional[List[str]] = None,
+) -> List[Tuple[str, float, Dict[str, Any]]]:
+    """BM25 search over posts with optional LLM expansion and rerank.
+
+    Every stage that fell back (LLM expansion/rerank timed out or failed, or the
+    search itself failed) appends its name to ``degraded`` when given, so callers
+    can tell a degraded result from a normal one.
+    """
     idx = os.getenv("OPENSEARCH_INDEX", "posts")
     cli = _client()
     
     try:
         # LLM 기반 쿼리 향상 (선택적)
         if use_llm_enhancement and os.getenv("LLM_ENHANCED_SEARCH", "1") == "1":
-            try:
-                llm_analysis = expand_query_with_llm(query, model)
-                body = build_enhanced_opensearch_query(query, llm_analysis)
-                body["size"] = min(top_k * 2, 100)  # 더 많은 후보 확보
-            except Exception:
-                # LLM 실패시 기본 쿼리로 폴백
-                body = _build_basic_query(query, top_k)
+            if os.getenv("LLM_EXPAND_MODE", "sync") == "parallel":
+                res = _parallel_expanded_search(cli, idx, query, top_k, model, degraded)
+            else:
+                try:
+                    llm_analysis = expand_query_with_llm(query, model, degraded=degraded)
+                    body = build_enhanced_opensearch_query(query, llm_analysis)
+                    body["size"] = min(top_k * 2, 100)  # 더 많은 후보 확보
+                except Exception:
+                    # LLM 실패시 기본 쿼리로 폴백
+                    _mark(degraded, "llm_expand")
+                    body = _build_basic_query(query, top_k)
+                res = cli.search(index=idx, body=body)
         else:
-            body = _build_basic_query(query, top_k)
-        
-        res = cli.search(index=idx, body=body)
+            res = cli.search(index=idx, body=_build_basic_query(query, top_k))
         hits = res.get("hits", {}).get("hits", [])
         
         out: List[Tuple[str, float, Dict[str, Any]]] = []
@@ -85,18 +102,48 @@ def bm25_search(query: str, top_k: int = 50, model: str = None, use_llm_enhancem
                         "snippet": payload.get("snippet", ""),
                         **payload
                     })
-                reranked_candidates = semantic_search_rerank(query, candidates, model)
+                reranked_candidates = semantic_search_rerank(query, candidates, model, degraded=degraded)
                 # 다시 원래 형태로 변환
                 out = [(c["id"], c["score"], {k: v for k, v in c.items() if k not in ["id", "score"]}) 
                        for c in reranked_candidates[:top_k]]
             except Exception:
-                pass  # 재랭킹 실패시 원본 결과 사용
+                _mark(degraded, "llm_rerank")  # 재랭킹 실패시 원본 결과 사용
                 
         return out[:top_k]
     except Exception:
+        _mark(degraded, "bm25")
         return []
 
 
+def _mark(degraded: Optional[List[str]], stage: str) -> None:
+    if degraded is not None:
+        degraded.append(stage)
+
+
+def _parallel_expanded_search(
+    cli: Any, idx: str, query: str, top_k: int, model: str = None, degraded: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """기본 검색과 LLM 쿼리 확장을 동시에 실행.
+
+    확장이 LLM_EXPAND_TIMEOUT_MS 안에 끝나면 확장 쿼리 결과를, 아니면 이미 받은
+    기본 검색 결과를 사용합니다. 늦게 끝난 확장은 캐시되어 다음 요청에 쓰입니다.
+    """
+    t0 = time.perf_counter()
+    fut = start_expansion(query, model)
+    baseline = cli.search(index=idx, body=_build_basic_query(query, top_k))
+    analysis = wait_expansion(fut, expand_timeout() - (time.perf_counter() - t0))
+    if analysis is None:
+        _mark(degraded, "llm_expand")
+        return baseline
+    try:
+        body = build_enhanced_opensearch_query(query, analysis)
+        body["size"] = min(top_k * 2, 100)
+        return cli.search(index=idx, body=body)
+    except Exception:
+        _mark(degraded, "llm_expand")
+        return baseline
+
+
 def _build_basic_query(query: str, top_k: int) -> Dict[str, Any]:
     """기본 OpenSearch 쿼리 구성"""
     return {
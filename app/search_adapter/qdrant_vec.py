@@ -1,5 +1,5 @@
 import os
-from typing import List, Tuple, Dict, Any
+from typing import List, Tuple, Dict, Any, Optional
 
 from app.models.embeddings import embed_query
 
@@ -22,9 +22,10 @@ def vector_search(
     query: str,
     collection: str = "post_chunks",
     top_k: int = 50,
+    degraded: Optional[List[str]] = None,
 ) -> List[Tuple[str, float, Dict[str, Any]]]:
     try:
-        vec = embed_query([query])[0]
+        vec = embed_query([query])[0]  # float32 row; qdrant-client accepts numpy vectors
         cli = _client()
         res = cli.search(collection_name=collection, query_vector=vec, limit=top_k, with_payload=True)
         out: List[Tuple[str, float, Dict[str, Any]]] = []
@@ -36,4 +37,6 @@ def vector_search(
         return out
     except Exception:
         # Gracefully degrade if collection is missing or Qdrant not ready
+        if degraded is not None:
+            degraded.append("vector")
         return []
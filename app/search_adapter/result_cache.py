@@ -0,0 +1,104 @@
+"""In-process cache of full hybrid search results, versioned by index generation.
+
+The worker bumps a generation counter in Redis (``bump_generation``) after
+every ingest or delete. Cache keys include the generation read at request
+time, so results computed against an older index are never served. Without
+Redis there is no generation to trust and the cache is bypassed.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from app.utils.redis_client import get_redis
+
+
+_GENERATION_KEY = "index:generation"
+
+_results: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+_lock = threading.Lock()
+_counts: Dict[str, Dict[str, int]] = {}
+_seen_generation: Optional[int] = None
+
+try:
+    from prometheus_client import Counter
+
+    _LOOKUPS = Counter(  # type: ignore
+        "rag_search_cache_total", "Hybrid search result cache lookups", ["endpoint", "result"]
+    )
+except Exception:  # pragma: no cover
+    _LOOKUPS = None
+
+
+def _size() -> int:
+    return int(os.getenv("SEARCH_CACHE_SIZE", "1024"))
+
+
+def index_generation() -> Optional[int]:
+    """Current index generation, or None when it cannot be read."""
+    global _seen_generation
+    red = get_redis()
+    if red is None:
+        return None
+    try:
+        gen = int(red.get(_GENERATION_KEY) or 0)
+    except Exception:
+        return None
+    with _lock:
+        if gen != _seen_generation:
+            # Older generations can never be served again; free them now
+            _results.clear()
+            _seen_generation = gen
+    return gen
+
+
+def bump_generation() -> Optional[int]:
+    """Mark every cached result as stale (called by the worker after index writes)."""
+    red = get_redis()
+    if red is None:
+        return None
+    try:
+        return int(red.incr(_GENERATION_KEY))
+    except Exception:
+        return None
+
+
+def make_key(generation: int, **parts: Any) -> str:
+    src = json.dumps({"gen": generation, **parts}, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(src.encode("utf-8")).hexdigest()
+
+
+def _count(endpoint: str, result: str) -> None:
+    with _lock:
+        per = _counts.setdefault(endpoint, {"hit": 0, "miss": 0})
+        per[result] += 1
+    if _LOOKUPS is not None:
+        _LOOKUPS.labels(endpoint=endpoint, result=result).inc()
+
+
+def get(key: str, endpoint: str) -> Optional[List[Dict[str, Any]]]:
+    with _lock:
+        rows = _results.get(key)
+        if rows is not None:
+            _results.move_to_end(key)
+    _count(endpoint, "hit" if rows is not None else "miss")
+    # Callers may decorate result dicts; hand out copies
+    return [dict(r) for r in rows] if rows is not None else None
+
+
+def put(key: str, rows: List[Dict[str, Any]]) -> None:
+    size = _size()
+    if size <= 0:
+        return
+    with _lock:
+        _results[key] = [dict(r) for r in rows]
+        _results.move_to_end(key)
+        while len(_results) > size:
+            _results.popitem(last=False)
+
+
+def stats() -> Dict[str, Any]:
+    with _lock:
+        return {"size": len(_results), "endpoints": {k: dict(v) for k, v in _counts.items()}}
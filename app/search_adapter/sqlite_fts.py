@@ -1,13 +1,67 @@
 import os
 import sqlite3
 import re
-from typing import List, Tuple, Dict, Any
+import threading
+from typing import List, Tuple, Dict, Any, Optional
+
+
+_local = threading.local()
 
 
 def _db_path() -> str:
     return os.getenv("SQLITE_PATH", "/data/sqlite/ir.db")
 
 
+def _open_reader(path: str) -> sqlite3.Connection:
+    """Open a read-only connection tuned for repeated FTS lookups."""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    cur = conn.cursor()
+    cur.execute("PRAGMA query_only=1")
+    # Memory-map the DB and keep a larger page cache across queries (cache_size<0 means KiB)
+    cur.execute(f"PRAGMA mmap_size={int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))}")
+    cur.execute(f"PRAGMA cache_size={-int(os.getenv('SQLITE_CACHE_KB', '65536'))}")
+    cur.close()
+    return conn
+
+
+def _close_reader() -> None:
+    conn = getattr(_local, "conn", None)
+    _local.conn = None
+    _local.key = None
+    if conn is not None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+def _get_reader() -> Optional[sqlite3.Connection]:
+    """Return this thread's long-lived read connection, or None if no DB yet.
+
+    The connection is reopened when SQLITE_PATH changes or the indexer swaps
+    the DB file (detected via device/inode), so readers never pin a stale file.
+    """
+    path = _db_path()
+    try:
+        st = os.stat(path)
+    except OSError:
+        _close_reader()
+        return None
+    key = (path, st.st_dev, st.st_ino)
+    conn = getattr(_local, "conn", None)
+    if conn is not None and getattr(_local, "key", None) == key:
+        return conn
+    _close_reader()
+    try:
+        conn = _open_reader(path)
+    except sqlite3.Error:
+        return None
+    _local.conn = conn
+    _local.key = key
+    return conn
+
+
 def _normalize_query(q: str) -> str:
     # Collapse multiple spaces
     q = re.sub(r"\s+", " ", q).strip()
@@ -71,18 +125,19 @@ def _fallback_like(conn: sqlite3.Connection, query: str, limit: int) -> List[Tup
     return out
 
 
-def bm25_search(query: str, top_k: int = 50) -> List[Tuple[str, float, Dict[str, Any]]]:
+def bm25_search(query: str, top_k: int = 50, degraded: Optional[List[str]] = None) -> List[Tuple[str, float, Dict[str, Any]]]:
     """Return list of (doc_id, score, payload) from FTS5 with BM25 ranking.
 
     payload contains: {title, snippet, tags, category, filetype, date}
+    When the index cannot be read, "bm25" is appended to ``degraded`` (if given).
     """
-    path = _db_path()
-    if not os.path.exists(path):
+    conn = _get_reader()
+    if conn is None:
+        if degraded is not None:
+            degraded.append("bm25")
         return []
-    conn = sqlite3.connect(path)
-    conn.row_factory = sqlite3.Row
+    cur = conn.cursor()
     try:
-        cur = conn.cursor()
         q = _normalize_query(query)
         # Use bm25(fts) scoring; snippet limited
         try:
@@ -99,7 +154,13 @@ def bm25_search(query: str, top_k: int = 50) -> List[Tuple[str, float, Dict[str,
                 (q, top_k),
             )
             rows = cur.fetchall()
-        except sqlite3.OperationalError:
+        except sqlite3.OperationalError as e:
+            if "no such table" in str(e):
+                # Schema not created yet (or file replaced mid-flight): reopen next time
+                _close_reader()
+                if degraded is not None:
+                    degraded.append("bm25")
+                return []
             # FTS5 syntax error - fallback to LIKE search
             return _fallback_like(conn, query, top_k)
             
@@ -124,5 +185,9 @@ def bm25_search(query: str, top_k: int = 50) -> List[Tuple[str, float, Dict[str,
             score = 1.0 / (1.0 + float(row["score"]))
             out.append((doc_id, score, payload))
         return out
-    finally:
-        conn.close()
+    except sqlite3.DatabaseError:
+        # Broken/replaced DB file: drop the cached connection so the next call reopens
+        _close_reader()
+        if degraded is not None:
+            degraded.append("bm25")
+        return []
@@ -0,0 +1,57 @@
+"""Compare memory/time of the old list-of-floats embedding path vs. float32 arrays.
+
+Usage: python -m app.tools.bench_embedding_path [N] [DIM]
+Simulates what ingest did per batch: normalize the encoder output, keep it
+until upsert. No model is loaded; random vectors stand in for encoder output.
+Times include tracemalloc overhead, which inflates the list path most.
+
+Measured (Python 3.11.7, numpy 2.4.6, 1 CPU, DIM=1024):
+
+    N       lists               arrays
+    512       674 ms   18.0 MiB    1.9 ms   4.0 MiB   (one INGEST_EMBED_BATCH)
+    2000     2372 ms   70.4 MiB    8.3 ms  15.6 MiB
+    5000     5661 ms  176.1 MiB   21.2 ms  39.1 MiB
+    20000   23005 ms  704.3 MiB   77.7 ms 156.4 MiB
+"""
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+
+def _measure(fn):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    out = fn()
+    elapsed = time.perf_counter() - t0
+    _cur, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return out, elapsed, peak
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    dim = int(sys.argv[2]) if len(sys.argv) > 2 else 1024
+    raw = np.random.default_rng(0).standard_normal((n, dim), dtype=np.float32)
+
+    def as_lists():
+        vecs = raw / (np.linalg.norm(raw, axis=1, keepdims=True) + 1e-12)
+        return vecs.tolist()
+
+    def as_array():
+        vecs = raw.copy()
+        vecs /= np.linalg.norm(vecs, axis=1, keepdims=True) + 1e-12
+        return vecs
+
+    _l, t_list, m_list = _measure(as_lists)
+    del _l
+    _a, t_arr, m_arr = _measure(as_array)
+    print(f"{n} x {dim} vectors")
+    print(f"  lists : {t_list * 1000:8.1f} ms  peak {m_list / 2**20:8.1f} MiB")
+    print(f"  arrays: {t_arr * 1000:8.1f} ms  peak {m_arr / 2**20:8.1f} MiB")
+    print(f"  saved : {(t_list - t_arr) * 1000:8.1f} ms  {(m_list - m_arr) / 2**20:8.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
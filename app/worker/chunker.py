@@ -1,4 +1,4 @@
-from typing import Iterable, List
+from typing import Iterable, Iterator, List
 
 
 def chunk_text(text: str, chunk_size: int = 400, overlap: int = 50) -> List[str]:
@@ -16,11 +16,14 @@ def chunk_text(text: str, chunk_size: int = 400, overlap: int = 50) -> List[str]
     return chunks
 
 
-def chunk_texts(texts: Iterable[str], chunk_size: int = 400, overlap: int = 50) -> List[str]:
-    out: List[str] = []
+def iter_chunks(texts: Iterable[str], chunk_size: int = 400, overlap: int = 50) -> Iterator[str]:
+    """Streaming variant of chunk_texts: consumes texts lazily (e.g. iter_pdf_pages)."""
     for t in texts:
         if not t:
             continue
-        out.extend(chunk_text(t, chunk_size=chunk_size, overlap=overlap))
-    return out
+        yield from chunk_text(t, chunk_size=chunk_size, overlap=overlap)
+
+
+def chunk_texts(texts: Iterable[str], chunk_size: int = 400, overlap: int = 50) -> List[str]:
+    return list(iter_chunks(texts, chunk_size=chunk_size, overlap=overlap))
 
@@ -1,26 +1,231 @@
+import hashlib
 import os
-from typing import Optional
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 import requests
+from requests.adapters import HTTPAdapter
 
 
-def download_to(path: str, url: str, timeout: int = 30) -> str:
+_CHUNK = 1024 * 1024
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+# Per-destination locks (with refcounts), so concurrent tasks never share a .part file
+_path_locks: Dict[str, Tuple[threading.Lock, int]] = {}
+_path_locks_guard = threading.Lock()
+
+
+def _get_session() -> requests.Session:
+    """Process-wide session so attachment downloads reuse pooled keep-alive connections."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            size = int(os.getenv("DOWNLOAD_POOL_SIZE", "8"))
+            sess = requests.Session()
+            adapter = HTTPAdapter(pool_connections=size, pool_maxsize=size)
+            sess.mount("http://", adapter)
+            sess.mount("https://", adapter)
+            _session = sess
+        return _session
+
+
+def sha1_file(path: str) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _blob_path(sha1: str) -> str:
+    storage = os.getenv("STORAGE_DIR", "/data/storage")
+    return os.path.join(storage, "blobs", sha1[:2], sha1)
+
+
+def _link_or_copy(src: str, dst: str) -> None:
+    # Stage under a unique name: concurrent callers may target the same dst
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dst), prefix=os.path.basename(dst) + ".", suffix=".tmp")
+    os.close(fd)
+    try:
+        try:
+            os.unlink(tmp)
+            os.link(src, tmp)
+        except OSError:
+            shutil.copyfile(src, tmp)
+        os.replace(tmp, dst)
+    except BaseException:
+        _discard(tmp)
+        raise
+
+
+def _remember_blob(path: str, sha1: str) -> None:
+    # Content-addressed alias so the same file is never downloaded twice
+    blob = _blob_path(sha1)
+    if not os.path.exists(blob):
+        try:
+            _link_or_copy(path, blob)
+        except OSError:
+            pass
+
+
+@contextmanager
+def _path_lock(path: str) -> Iterator[None]:
+    with _path_locks_guard:
+        lock, refs = _path_locks.get(path, (threading.Lock(), 0))
+        _path_locks[path] = (lock, refs + 1)
+    try:
+        with lock:
+            yield
+    finally:
+        with _path_locks_guard:
+            lock, refs = _path_locks[path]
+            if refs <= 1:
+                del _path_locks[path]
+            else:
+                _path_locks[path] = (lock, refs - 1)
+
+
+def _validator(r: requests.Response) -> Optional[str]:
+    # If-Range needs a strong ETag; fall back to Last-Modified
+    etag = r.headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return r.headers.get("Last-Modified")
+
+
+def _read_validator(part: str) -> Optional[str]:
+    try:
+        with open(part + ".validator", "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def _write_validator(part: str, validator: Optional[str]) -> None:
+    if validator:
+        with open(part + ".validator", "w", encoding="utf-8") as f:
+            f.write(validator)
+    else:
+        _discard(part + ".validator")
+
+
+def _discard(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def download_to(path: str, url: str, timeout: int = 30) -> Tuple[str, str]:
+    """Stream ``url`` to ``path`` and return (path, sha1), hashing while writing.
+
+    Data goes to ``path + '.part'``; an interrupted transfer resumes from the
+    partial file with an HTTP Range request (up to DOWNLOAD_RETRIES attempts).
+    A ``.part`` left by an earlier call is only resumed when the server's ETag /
+    Last-Modified was recorded for it, sent as If-Range so a changed file comes
+    back whole (200) instead of being spliced onto stale bytes. Calls for the
+    same ``path`` in this process run one at a time.
+    """
+    with _path_lock(path):
+        return _download(path, url, timeout)
+
+
+def _download(path: str, url: str, timeout: int) -> Tuple[str, str]:
     os.makedirs(os.path.dirname(path), exist_ok=True)
-    with requests.get(url, stream=True, timeout=timeout) as r:
-        r.raise_for_status()
-        with open(path, "wb") as f:
-            for chunk in r.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
-    return path
+    part = path + ".part"
+    if os.path.exists(part) and _read_validator(part) is None:
+        _discard(part)  # unknown origin: cannot prove it matches the current file
+    retries = int(os.getenv("DOWNLOAD_RETRIES", "3"))
+    sess = _get_session()
+    for attempt in range(retries + 1):
+        offset = os.path.getsize(part) if os.path.exists(part) else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        validator = _read_validator(part) if offset else None
+        if validator:
+            headers["If-Range"] = validator
+        try:
+            with sess.get(url, stream=True, timeout=timeout, headers=headers) as r:
+                if r.status_code == 416:
+                    # Range not satisfiable: partial file is stale, start over
+                    _discard(part)
+                    _discard(part + ".validator")
+                    continue
+                r.raise_for_status()
+                h = hashlib.sha1()
+                if r.status_code == 206 and offset:
+                    if not r.headers.get("Content-Range", "").startswith(f"bytes {offset}-"):
+                        _discard(part)  # server answered a different range
+                        continue
+                    with open(part, "rb") as f:
+                        for chunk in iter(lambda: f.read(_CHUNK), b""):
+                            h.update(chunk)
+                    mode = "ab"
+                else:
+                    mode = "wb"  # fresh transfer, or the file changed / server ignored the Range header
+                    _write_validator(part, _validator(r))
+                with open(part, mode) as f:
+                    for chunk in r.iter_content(chunk_size=_CHUNK):
+                        if chunk:
+                            f.write(chunk)
+                            h.update(chunk)
+            os.replace(part, path)
+            _discard(part + ".validator")
+            return path, h.hexdigest()
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError):
+            # Transient failure: keep the .part file and resume on the next attempt
+            if attempt >= retries:
+                raise
+    raise RuntimeError(f"download failed: {url}")
 
 
-def maybe_download(dest_dir: str, filename: str, url: Optional[str]) -> Optional[str]:
+def fetch_attachment(dest_dir: str, filename: str, url: Optional[str], expected_sha1: Optional[str] = None) -> Optional[Tuple[str, str]]:
+    """Make ``dest_dir/filename`` available locally and return (path, sha1).
+
+    Nothing is transferred when the file (or any stored file with the expected
+    sha1) is already on disk.
+    """
     if not url:
         return None
-    os.makedirs(dest_dir, exist_ok=True)
     path = os.path.join(dest_dir, filename)
-    if not os.path.exists(path):
-        return download_to(path, url)
-    return path
+    if os.path.exists(path):
+        digest = sha1_file(path)
+        if not expected_sha1 or digest == expected_sha1:
+            return path, digest
+    if expected_sha1 and os.path.exists(_blob_path(expected_sha1)):
+        _link_or_copy(_blob_path(expected_sha1), path)
+        return path, expected_sha1
+    path, digest = download_to(path, url)
+    _remember_blob(path, digest)
+    return path, digest
+
+
+def fetch_attachments(dest_dir: str, attachments: List[Dict[str, Any]]) -> List[Optional[Tuple[str, str]]]:
+    """Fetch a post's attachments concurrently; results follow input order.
 
+    Each attachment is {filename, url, sha1?}. Errors propagate to the caller.
+    Attachments with the same filename share one job (the first one's url), so
+    two downloads never write the same ``.part`` / validator files at once.
+    """
+    if not attachments:
+        return []
+    os.makedirs(dest_dir, exist_ok=True)
+    jobs: Dict[str, Dict[str, Any]] = {}
+    for att in attachments:
+        jobs.setdefault(os.path.join(dest_dir, att["filename"]), att)
+    workers = max(1, min(len(jobs), int(os.getenv("DOWNLOAD_CONCURRENCY", "4"))))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="download") as pool:
+        futures = {
+            path: pool.submit(fetch_attachment, dest_dir, att["filename"], att.get("url"), att.get("sha1"))
+            for path, att in jobs.items()
+        }
+        return [futures[os.path.join(dest_dir, att["filename"])].result() for att in attachments]
+
+
+def maybe_download(dest_dir: str, filename: str, url: Optional[str]) -> Optional[str]:
+    res = fetch_attachment(dest_dir, filename, url)
+    return res[0] if res else None
@@ -0,0 +1,95 @@
+import gzip
+import json
+import os
+import tempfile
+from typing import Iterable, Iterator, Optional
+
+
+def _enabled() -> bool:
+    return os.getenv("PARSE_CACHE", "1") == "1"
+
+
+def _cache_dir(storage: str) -> str:
+    return os.path.join(storage, "parse_cache")
+
+
+def _cache_path(storage: str, sha1: str, kind: str, version: str) -> str:
+    # Content-addressed: same file attached to many posts shares one entry.
+    # One JSON string per line, so entries are read and written a page at a time.
+    return os.path.join(_cache_dir(storage), sha1[:2], f"{sha1}.{kind}.v{version}.jsonl.gz")
+
+
+def _read_lines(path: str) -> Iterator[str]:
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
+    except (OSError, ValueError):
+        # Corrupt entry: drop it so the next ingest parses the file again
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+        raise
+
+
+def load(storage: str, sha1: str, kind: str, version: str) -> Optional[Iterator[str]]:
+    """Return cached parsed texts for (sha1, parser kind/version) as a lazy iterator, or None.
+
+    A read error part way through is raised from the iterator.
+    """
+    if not _enabled() or not sha1:
+        return None
+    path = _cache_path(storage, sha1, kind, version)
+    if not os.path.exists(path):
+        return None
+    return _read_lines(path)
+
+
+def tee(storage: str, sha1: str, kind: str, version: str, texts: Iterable[str]) -> Iterator[str]:
+    """Yield ``texts`` while writing them to the cache (gzip JSON lines).
+
+    The entry is committed atomically once ``texts`` is exhausted, so readers never
+    see partial files; a parse that fails or is abandoned part way leaves no entry.
+    Empty output may mean a missing parser library and is not cached.
+    """
+    if not _enabled() or not sha1:
+        yield from texts
+        return
+    path = _cache_path(storage, sha1, kind, version)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    except OSError:
+        yield from texts
+        return
+    raw = os.fdopen(fd, "wb")
+    gz: Optional[gzip.GzipFile] = gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6)
+    count = 0
+    try:
+        for text in texts:
+            if gz is not None:
+                try:
+                    gz.write(json.dumps(text, ensure_ascii=False).encode("utf-8") + b"\n")
+                except OSError:
+                    gz = None  # cache write failed; keep passing texts through
+            count += 1
+            yield text
+        if gz is not None and count:
+            try:
+                gz.close()
+                raw.close()
+                os.replace(tmp, path)
+            except OSError:
+                pass
+    finally:
+        for f in (gz, raw):
+            try:
+                if f is not None:
+                    f.close()
+            except OSError:
+                pass
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
@@ -0,0 +1,202 @@
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Iterator, List, Optional, Tuple
+
+from app.parser.pdf_parser import parse_pdf, parse_pdf_pages, iter_pdf_pages
+
+
+class ParseFailed(Exception):
+    """A parser process timed out, died (e.g. PARSE_MAX_MEMORY_MB hit) or raised."""
+
+
+# Threads that each drive one reusable parser process (PARSE_WORKERS concurrent parsers)
+_runner: Optional[ThreadPoolExecutor] = None
+_runner_lock = threading.Lock()
+
+
+def _workers() -> int:
+    return int(os.getenv("PARSE_WORKERS", "2"))
+
+
+def _timeout() -> float:
+    return float(os.getenv("PARSE_TIMEOUT", "300"))
+
+
+def _pdf_pages_per_task() -> int:
+    return int(os.getenv("PARSE_PDF_PAGES_PER_TASK", "50"))
+
+
+def _start_method() -> str:
+    # Never fork: children of a threaded worker (or one holding a loaded model) must
+    # start from a clean interpreter to run under an address-space cap
+    method = os.getenv("PARSE_START_METHOD", "forkserver")
+    return method if method in multiprocessing.get_all_start_methods() and method != "fork" else "spawn"
+
+
+def _limit_memory() -> None:
+    """Cap the address space of a parser process (runs in the child)."""
+    mb = int(os.getenv("PARSE_MAX_MEMORY_MB", "512"))
+    if mb <= 0:
+        return
+    try:
+        import resource
+
+        resource.setrlimit(resource.RLIMIT_AS, (mb * 1024 * 1024, mb * 1024 * 1024))
+    except Exception:  # pragma: no cover - not available on every platform
+        pass
+
+
+def _max_tasks_per_child() -> int:
+    return int(os.getenv("PARSE_MAX_TASKS_PER_CHILD", "50"))
+
+
+def _serve(conn: Any) -> None:
+    """Parser process loop: run (fn, args) jobs from the pipe until it closes."""
+    _limit_memory()
+    while True:
+        try:
+            fn, args = conn.recv()
+        except (EOFError, OSError):
+            break
+        try:
+            conn.send(("ok", fn(*args)))
+        except BaseException as e:  # MemoryError included
+            try:
+                conn.send(("error", repr(e)))
+            except BaseException:
+                pass
+            break  # state unknown after a failure: exit, the caller starts a fresh process
+    conn.close()
+
+
+class _ParserProcess:
+    """One long-lived parser process, driven by a single runner thread."""
+
+    def __init__(self) -> None:
+        ctx = multiprocessing.get_context(_start_method())
+        self.conn, child = ctx.Pipe()
+        self.proc = ctx.Process(target=_serve, args=(child,), daemon=True)
+        self.proc.start()
+        child.close()
+        self.tasks = 0
+
+    def run(self, fn: Callable[..., Any], args: Tuple[Any, ...]) -> Any:
+        self.tasks += 1
+        self.conn.send((fn, args))
+        if not self.conn.poll(_timeout()):
+            raise ParseFailed(f"{fn.__name__} timed out after {_timeout():.0f}s")
+        try:
+            status, value = self.conn.recv()
+        except EOFError:
+            raise ParseFailed(f"{fn.__name__} parser process died")
+        if status != "ok":
+            raise ParseFailed(value)
+        return value
+
+    def stop(self, kill: bool = False) -> None:
+        self.conn.close()  # the process exits on EOF
+        self.proc.join(timeout=0 if kill else 1.0)
+        if self.proc.is_alive():
+            self.proc.kill()
+            self.proc.join()
+
+
+# Each runner thread owns at most one parser process (so PARSE_WORKERS processes in all)
+_local = threading.local()
+
+
+def _run_isolated(fn: Callable[..., Any], *args: Any) -> Any:
+    """Run ``fn(*args)`` in this runner thread's parser process.
+
+    Processes are reused for up to PARSE_MAX_TASKS_PER_CHILD tasks, then
+    replaced (bounding leaks in the parser libraries). Only the process that
+    timed out, died or raised is killed; the next task starts a fresh one.
+    """
+    proc: Optional[_ParserProcess] = getattr(_local, "proc", None)
+    if proc is None or not proc.proc.is_alive():
+        proc = _local.proc = _ParserProcess()
+    try:
+        value = proc.run(fn, args)
+    except BaseException:
+        _local.proc = None
+        proc.stop(kill=True)
+        raise
+    if proc.tasks >= max(1, _max_tasks_per_child()):
+        _local.proc = None
+        proc.stop()
+    return value
+
+
+def _get_runner() -> ThreadPoolExecutor:
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = ThreadPoolExecutor(max_workers=_workers(), thread_name_prefix="parse")
+        return _runner
+
+
+class ParseStream:
+    """Texts of one attachment (pages, row blocks, ...), parsed as they are consumed.
+
+    PDFs are parsed in PARSE_PDF_PAGES_PER_TASK page ranges with at most
+    PARSE_WORKERS ranges in flight ahead of the reader, so only a bounded window
+    of pages is ever held, whatever the document size; the range that comes back
+    short marks the end of the document. Other files are parsed in one task.
+    Iterating raises ParseFailed when a parse times out, dies (e.g.
+    PARSE_MAX_MEMORY_MB hit) or raises. Parses in-process when PARSE_WORKERS=0
+    or the current process cannot have children (Celery prefork).
+    """
+
+    def __init__(self, fn: Callable[[str], List[str]], path: str):
+        self.fn = fn
+        self.path = path
+        step = _pdf_pages_per_task()
+        self._step = step if fn is parse_pdf and step > 0 else 0
+        self._next = 0
+        self._pending: Deque[Future] = deque()
+        self._inline = _workers() <= 0 or multiprocessing.current_process().daemon
+
+    def _submit(self) -> None:
+        runner = _get_runner()
+        if not self._step:
+            self._pending.append(runner.submit(_run_isolated, self.fn, self.path))
+            self._next = -1
+            return
+        start = self._next
+        self._pending.append(runner.submit(_run_isolated, parse_pdf_pages, self.path, start, start + self._step))
+        self._next = start + self._step
+
+    def _fill(self) -> None:
+        while self._next >= 0 and len(self._pending) < max(1, _workers()):
+            self._submit()
+
+    def start(self) -> None:
+        """Start parsing ahead of iteration (so a post's attachments parse concurrently)."""
+        if not self._inline and not self._pending and self._next == 0:
+            self._fill()
+
+    def __iter__(self) -> Iterator[str]:
+        if self._inline:
+            if self.fn is parse_pdf:
+                yield from iter_pdf_pages(self.path)
+            else:
+                yield from self.fn(self.path)
+            return
+        self.start()
+        try:
+            while self._pending:
+                texts = self._pending.popleft().result()
+                if not self._step or len(texts) < self._step:
+                    # Last range: drop read-ahead past the end of the document
+                    self._next = -1
+                    while self._pending:
+                        self._pending.pop().cancel()
+                self._fill()
+                yield from texts
+        finally:
+            for fut in self._pending:
+                fut.cancel()
+            self._pending.clear()
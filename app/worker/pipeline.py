@@ -2,17 +2,28 @@ import os
 import time
 import hashlib
 import uuid
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple, Callable, Iterable, Iterator
 
 from app.utils.config import get_settings
+from app.utils import answer_cache
+from app.search_adapter import result_cache
 from app.models.embeddings import embed_passages
-from app.parser.pdf_parser import parse_pdf
-from app.parser.xlsx_parser import parse_xlsx
-from app.parser.docx_parser import parse_docx
-from app.worker.downloader import maybe_download
-from app.worker.chunker import chunk_texts
-from app.indexer.index_qdrant import upsert_embeddings, ensure_collection, delete_by_post_id
-from app.indexer.index_sqlite_fts5 import index_post, save_post_meta, save_attachments, delete_post as sqlite_delete
+from app.parser.pdf_parser import parse_pdf, PARSER_VERSION as PDF_PARSER_VERSION
+from app.parser.xlsx_parser import parse_xlsx, PARSER_VERSION as XLSX_PARSER_VERSION
+from app.parser.docx_parser import parse_docx, PARSER_VERSION as DOCX_PARSER_VERSION
+from app.worker import parse_cache
+from app.worker.parse_pool import ParseStream
+from app.worker.downloader import fetch_attachments
+from app.worker.chunker import iter_chunks
+from app.indexer.index_qdrant import (
+    upsert_embeddings,
+    ensure_collection,
+    delete_by_post_id,
+    scroll_post_points,
+    retrieve_vectors,
+    delete_points,
+)
+from app.indexer.index_sqlite_fts5 import get_session as sqlite_session, delete_post as sqlite_delete
 import os as _os
 _IR_BACKEND = _os.getenv("IR_BACKEND", "sqlite").lower()
 _USE_OPENSEARCH = _IR_BACKEND == "opensearch" or _os.getenv("IR_DUAL", "0") == "1"
@@ -31,151 +42,485 @@ def _sha1(data: bytes) -> str:
     return hashlib.sha1(data).hexdigest()
 
 
-def _parse_attachment(path: str) -> List[str]:
+def _parser_for(path: str) -> Optional[Tuple[str, Callable[[str], List[str]], str]]:
+    """Return (kind, parse function, parser version) for a file, or None if unsupported."""
     lower = path.lower()
     if lower.endswith(".pdf"):
-        return parse_pdf(path)
+        return "pdf", parse_pdf, PDF_PARSER_VERSION
     if lower.endswith(".xlsx") or lower.endswith(".xlsm"):
-        return parse_xlsx(path)
+        return "xlsx", parse_xlsx, XLSX_PARSER_VERSION
     if lower.endswith(".docx"):
-        return parse_docx(path)
-    return []
+        return "docx", parse_docx, DOCX_PARSER_VERSION
+    return None
 
 
-def run_ingest(event: Dict[str, Any]) -> Dict[str, Any]:
-    """Process a single webhook event and index content.
+def _attachment_texts(path: str, sha1: str, storage: Optional[str] = None) -> Tuple[Iterable[str], Optional[ParseStream]]:
+    """Lazy texts of one attachment, plus its parse stream (None when nothing is parsed).
 
-    Expected minimal event fields:
-    - post_id: int or str
-    - title: str
-    - body: str (optional)
-    - tags, category, filetype, date: optional metadata
-    - attachments: [{filename, url}] (optional)
+    Hits in the on-disk parse cache (sha1 + parser version) skip parsing entirely;
+    otherwise the file is parsed via the parse pool and cached as the texts stream by.
+    Iterating raises when the parse times out or crashes.
     """
-    # Allow delete action
-    action = str(event.get("action", "")).lower()
-    if action == "post_deleted":
-        return run_delete(event)
-    if action == "post_updated":
-        try:
-            run_delete(event)
-        except Exception:
-            pass
+    parser = _parser_for(path)
+    if parser is None:
+        return [], None
+    kind, parse, version = parser
+    if storage and sha1:
+        cached = parse_cache.load(storage, sha1, kind, version)
+        if cached is not None:
+            return cached, None
+    stream = ParseStream(parse, path)
+    if storage and sha1:
+        return parse_cache.tee(storage, sha1, kind, version, stream), stream
+    return stream, stream
 
-    settings = get_settings()
-    storage = settings.get("STORAGE_DIR", "/data/storage")
-    sqlite_path = settings.get("SQLITE_PATH", "/data/sqlite/ir.db")
 
+def _post_meta(event: Dict[str, Any]) -> Dict[str, str]:
     post_id = str(event.get("post_id", "unknown"))
-    title = str(event.get("title", f"post:{post_id}"))
-    body = str(event.get("body", ""))
     tags = ",".join(event.get("tags", []) or []) if isinstance(event.get("tags"), list) else str(event.get("tags", ""))
-    category = str(event.get("category", ""))
-    filetype = str(event.get("filetype", ""))
-    date = str(event.get("date", ""))
-
-    # 1) Download attachments
-    attachments = event.get("attachments") or []
-    post_dir = os.path.join(storage, "posts", post_id)
-    local_paths: List[str] = []
-    attachment_infos: List[Dict[str, Any]] = []
-    for att in attachments:
-        url = att.get("url")
-        filename = att.get("filename") or f"file_{int(time.time())}"
-        path = maybe_download(post_dir, filename, url)
-        if path:
-            # Hash verification
-            with open(path, "rb") as f:
-                digest = _sha1(f.read())
-            expected = att.get("sha1") or att.get("checksum")
-            if expected and expected != digest:
-                raise ValueError(f"checksum mismatch for {filename}")
-            local_paths.append(path)
-            attachment_infos.append({"filename": filename, "sha1": digest})
-
-    # 2) Parse attachments
-    parsed_texts: List[str] = []
-    for p in local_paths:
-        parsed_texts.extend(_parse_attachment(p))
-
-    # 3) Qdrant: 첨부파일만 벡터 인덱싱 (게시글 본문 제외)
-    chunks: List[str] = []  # Initialize chunks outside the if block
-    if parsed_texts:  # 첨부파일이 있는 경우만
-        chunks = chunk_texts(parsed_texts, chunk_size=400, overlap=50)
-        vectors = embed_passages(chunks, dim=1024)
+    return {
+        "post_id": post_id,
+        "title": str(event.get("title", f"post:{post_id}")),
+        "body": str(event.get("body", "")),
+        "tags": tags,
+        "category": str(event.get("category", "")),
+        "filetype": str(event.get("filetype", "")),
+        "date": str(event.get("date", "")),
+        "severity": str(event.get("severity", "")),
+    }
+
+
+# Namespace for deterministic chunk point IDs (uuid5); never change once data is indexed
+_CHUNK_NAMESPACE = uuid.UUID("6f1c3e0a-5b7d-4c52-9a8e-2d4f7b1e9c30")
+
+
+def _point_id(post_id: str, sha1: str, offset: int, text: str) -> str:
+    """Stable Qdrant point id from (post_id, attachment sha1, chunk offset, chunk text hash)."""
+    text_hash = _sha1(text.encode("utf-8"))
+    return str(uuid.uuid5(_CHUNK_NAMESPACE, f"{post_id}:{sha1}:{offset}:{text_hash}"))
+
+
+def _fetch_attachments(event: Dict[str, Any], post_dir: str, known_sha1s: Optional[set] = None) -> List[Dict[str, Any]]:
+    """Download attachments (concurrently) and verify checksums.
+
+    Returns [{filename, sha1, path, reused}]. An attachment whose sha1 is already
+    indexed for the post (``known_sha1s``) is marked reused; when the event carries
+    that sha1 up front the download is skipped entirely (path=None).
+    """
+    known_sha1s = known_sha1s or set()
+    items: List[Dict[str, Any]] = []
+    pending: List[Dict[str, Any]] = []
+    for i, att in enumerate(event.get("attachments") or []):
+        filename = att.get("filename") or f"file_{int(time.time())}_{i}"
+        expected = att.get("sha1") or att.get("checksum")
+        if expected and expected in known_sha1s:
+            items.append({"filename": filename, "sha1": expected, "path": None, "reused": True})
+            continue
+        item = {"filename": filename, "sha1": expected, "url": att.get("url")}
+        items.append(item)
+        pending.append(item)
+
+    # sha1 is computed while streaming; files already in storage are not downloaded
+    for item, res in zip(pending, fetch_attachments(post_dir, pending)):
+        item.pop("url")
+        expected = item["sha1"]
+        if res is None:
+            items.remove(item)
+            continue
+        path, digest = res
+        if expected and expected != digest:
+            raise ValueError(f"checksum mismatch for {item['filename']}")
+        item.update({"sha1": digest, "path": path, "reused": digest in known_sha1s})
+    return items
+
 
+def _chunk_payload(meta: Dict[str, str], chunk_id: int, text: str, sha1: str, offset: int) -> Dict[str, Any]:
+    return {
+        "post_id": meta["post_id"],
+        "chunk_id": chunk_id,
+        "text": text,
+        "title": meta["title"],
+        "category": meta["category"],
+        "tags": meta["tags"],
+        "source": f"{meta['title']}#attachment:{chunk_id}",  # 첨부파일임을 명시
+        "filetype": meta["filetype"],
+        "posted_at": meta["date"],
+        "attachment_sha1": sha1,
+        "chunk_offset": offset,
+    }
+
+
+def _existing_points(post_id: str) -> Dict[str, Dict[str, Any]]:
+    """Chunks already in Qdrant for the post; falls back to a full delete if they cannot be listed."""
+    try:
+        return scroll_post_points("post_chunks", post_id)
+    except Exception:
         try:
-            ensure_collection("post_chunks", dim=1024)
+            delete_by_post_id("post_chunks", post_id)
         except Exception:
             pass
-        points = []
-        for i, (text, vec) in enumerate(zip(chunks, vectors)):
-            pid = str(uuid.uuid4())
-            points.append(
-                {
-                    "id": pid,
-                    "vector": vec,
-                    "post_id": post_id,
-                    "chunk_id": i,
-                    "text": text,
-                    "title": title,
-                    "category": category,
-                    "tags": tags,
-                    "source": f"{title}#attachment:{i}",  # 첨부파일임을 명시
-                    "filetype": filetype,
-                    "posted_at": date,
-                }
-            )
-        upsert_embeddings("post_chunks", points, dim=1024)
-
-    # 4) OpenSearch/SQLite FTS: 게시글 본문만 인덱싱 (첨부파일 제외)
-    index_post(
-        sqlite_path,
-        post_id=post_id,
-        title=title,
-        body=body,  # 게시글 본문만 인덱싱
-        tags=tags,
-        category=category,
-        filetype=filetype,
-        posted_at=date,
-        severity=str(event.get("severity", ""))
+        return {}
+
+
+def _plan_vectors(
+    meta: Dict[str, str],
+    items: List[Dict[str, Any]],
+    existing: Dict[str, Dict[str, Any]],
+    storage: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Set up the diff of the post's desired chunk points against ``existing`` Qdrant points.
+
+    Nothing is parsed or chunked here: ``_iter_points`` streams each attachment's
+    chunks when the plan is applied. Reused attachments are rebuilt from the
+    stored chunk texts, so they are neither parsed nor embedded again. The
+    counters (chunks, embedded), ``failed`` and ``stale`` are filled in as the
+    plan is applied.
+    """
+    stored: Dict[str, List[Tuple[int, str]]] = {}
+    for payload in existing.values():
+        sha = payload.get("attachment_sha1")
+        if sha:
+            stored.setdefault(sha, []).append((int(payload.get("chunk_offset", 0)), str(payload.get("text", ""))))
+    for chunks in stored.values():
+        chunks.sort()
+
+    sources: List[Dict[str, Any]] = []
+    seen: set = set()
+    for item in items:
+        if item["sha1"] in seen:  # same file attached twice
+            continue
+        seen.add(item["sha1"])
+        if item["path"] and not (item["reused"] and item["sha1"] in stored):
+            texts, stream = _attachment_texts(item["path"], item["sha1"], storage)
+        else:
+            texts, stream = None, None
+        sources.append({"item": item, "texts": texts, "stream": stream})
+    return {
+        "meta": meta,
+        "existing": existing,
+        "stored": stored,
+        "sources": sources,
+        "seen": seen,
+        "chunks": 0,
+        "embedded": 0,
+        "failed": [],
+        "stale": [],
+        "applied": False,
+    }
+
+
+def _iter_points(plan: Dict[str, Any]) -> Iterator[Tuple[Dict[str, Any], bool]]:
+    """Stream the plan's chunk points that need writing, as (point, needs embedding).
+
+    Unchanged points are only counted. Chunks of a changed payload come back with
+    False (their stored vector is reused). An attachment whose parse times out or
+    crashes part way is listed in ``failed`` and the rest of it is taken from the
+    stored chunks; while any are failed, chunks of attachments no longer on the
+    post are kept rather than deleted, since they may be the failed file's
+    previous version. ``stale`` is set once the stream is exhausted.
+    """
+    meta, existing, stored = plan["meta"], plan["existing"], plan["stored"]
+    # Let all of the post's attachments start parsing while the first is consumed
+    for src in plan["sources"]:
+        if src["stream"] is not None:
+            src["stream"].start()
+
+    keep: set = set()
+
+    def _point(sha: str, offset: int, text: str) -> Optional[Tuple[Dict[str, Any], bool]]:
+        idx = plan["chunks"]
+        plan["chunks"] += 1
+        pid = _point_id(meta["post_id"], sha, offset, text)
+        keep.add(pid)
+        payload = _chunk_payload(meta, idx, text, sha, offset)
+        if pid not in existing:
+            return {"id": pid, **payload}, True
+        if existing[pid] != payload:
+            return {"id": pid, **payload}, False
+        return None
+
+    for src in plan["sources"]:
+        sha = src["item"]["sha1"]
+        if src["texts"] is None:
+            chunks: Iterable[str] = (text for _offset, text in stored.get(sha, []))
+        else:
+            chunks = iter_chunks(src["texts"], chunk_size=400, overlap=50)
+        offset = 0
+        try:
+            for text in chunks:
+                out = _point(sha, offset, text)
+                offset += 1
+                if out is not None:
+                    yield out
+        except Exception:
+            plan["failed"].append(src["item"]["filename"])
+            for old_offset, text in stored.get(sha, []):
+                if old_offset >= offset:
+                    out = _point(sha, old_offset, text)
+                    if out is not None:
+                        yield out
+    plan["stale"] = [
+        pid for pid, payload in existing.items()
+        if pid not in keep and (not plan["failed"] or payload.get("attachment_sha1") in plan["seen"])
+    ]
+
+
+def _apply_vector_plans(plans: List[Dict[str, Any]]) -> None:
+    """Embed only new chunks, rewrite changed payloads with stored vectors, drop stale points.
+
+    Chunks are streamed from the parsers (page range by page range) through the
+    embedder and into Qdrant in bounded INGEST_EMBED_BATCH slices (chunk -> embed
+    -> upsert -> release), across posts, so memory stays flat no matter how large
+    a document is. A post's stale points are deleted once all of its points are
+    written, and the plan is then marked ``applied``.
+    """
+    batch = max(1, int(_os.getenv("INGEST_EMBED_BATCH", "512")))
+    ensured = False
+    embeds: List[Tuple[Dict[str, Any], Dict[str, Any]]] = []
+    rewrites: List[Tuple[Dict[str, Any], Dict[str, Any]]] = []
+    finished: List[Dict[str, Any]] = []
+
+    def _upsert(upserts: List[Dict[str, Any]]) -> None:
+        nonlocal ensured
+        if not ensured:
+            try:
+                ensure_collection("post_chunks", dim=1024)
+            except Exception:
+                pass
+            ensured = True
+        upsert_embeddings("post_chunks", upserts, dim=1024)
+
+    def _flush_rewrites() -> None:
+        # Unchanged chunks whose payload changed: reuse the stored vector
+        if not rewrites:
+            return
+        stored = retrieve_vectors("post_chunks", [point["id"] for _plan, point in rewrites])
+        upserts = []
+        for plan, point in rewrites:
+            if point["id"] in stored:
+                upserts.append({**point, "vector": stored[point["id"]]})
+            else:  # vector vanished between scroll and retrieve: embed it again
+                embeds.append((plan, point))
+        rewrites.clear()
+        if upserts:
+            _upsert(upserts)
+
+    def _flush_embeds() -> None:
+        if not embeds:
+            return
+        vectors = embed_passages([point["text"] for _plan, point in embeds], dim=1024)
+        _upsert([{**point, "vector": vec} for (_plan, point), vec in zip(embeds, vectors)])
+        for plan, _point in embeds:
+            plan["embedded"] += 1
+        embeds.clear()
+
+    def _finish() -> None:
+        # Delete after upsert so a post never disappears from search mid-update
+        delete_points("post_chunks", [pid for plan in finished for pid in plan["stale"]])
+        for plan in finished:
+            plan["applied"] = True
+        finished.clear()
+
+    for plan in plans:
+        for point, new in _iter_points(plan):
+            (embeds if new else rewrites).append((plan, point))
+            if len(rewrites) >= batch:
+                _flush_rewrites()
+            if len(embeds) >= batch:
+                _flush_embeds()
+            if finished and not embeds and not rewrites:
+                _finish()
+        finished.append(plan)
+    _flush_rewrites()
+    _flush_embeds()
+    _finish()
+
+
+def _index_fts(fts: Any, meta: Dict[str, str], attachment_infos: List[Dict[str, Any]]) -> None:
+    fts.index_post(
+        post_id=meta["post_id"],
+        title=meta["title"],
+        body=meta["body"],  # 게시글 본문만 인덱싱
+        tags=meta["tags"],
+        category=meta["category"],
+        filetype=meta["filetype"],
+        posted_at=meta["date"],
+        severity=meta["severity"],
     )
+    # Save meta + attachments for UI
+    fts.save_post_meta(
+        post_id=meta["post_id"],
+        title=meta["title"],
+        category=meta["category"],
+        posted_at=meta["date"],
+        severity=meta["severity"],
+    )
+    if attachment_infos:
+        fts.save_attachments(post_id=meta["post_id"], items=attachment_infos)
+
+
+def _index_opensearch(meta: Dict[str, str]) -> None:
     # Optional: also index into OpenSearch for scalable IR
     if _USE_OPENSEARCH and os_upsert_post is not None:
         try:
             os_upsert_post(
-                post_id=post_id,
-                title=title,
-                body=body,  # 게시글 본문만 인덱싱
-                tags=tags,
-                category=category,
-                filetype=filetype,
-                posted_at=date,
-                severity=str(event.get("severity", "")),
+                post_id=meta["post_id"],
+                title=meta["title"],
+                body=meta["body"],  # 게시글 본문만 인덱싱
+                tags=meta["tags"],
+                category=meta["category"],
+                filetype=meta["filetype"],
+                posted_at=meta["date"],
+                severity=meta["severity"],
                 index=_os.getenv("OPENSEARCH_INDEX", "posts"),
             )
         except Exception:
             pass
 
-    # 7) Save meta + attachments for UI
-    save_post_meta(
-        sqlite_path,
-        post_id=post_id,
-        title=title,
-        category=category,
-        posted_at=date,
-        severity=str(event.get("severity", "")),
-    )
-    if attachment_infos:
-        save_attachments(sqlite_path, post_id=post_id, items=attachment_infos)
 
+def _prepare_post(event: Dict[str, Any], storage: str, update: bool) -> Dict[str, Any]:
+    """Download/parse one post and diff its chunks against Qdrant."""
+    meta = _post_meta(event)
+    # post_updated: keep chunks that did not change instead of deleting everything
+    existing = _existing_points(meta["post_id"]) if update else {}
+    known = {p.get("attachment_sha1") for p in existing.values() if p.get("attachment_sha1")}
+    items = _fetch_attachments(event, os.path.join(storage, "posts", meta["post_id"]), known)
     return {
-        "post_id": post_id,
-        "title": title,
-        "attachments": len(local_paths),
-        "chunks": len(chunks),
+        "meta": meta,
+        "update": update,
+        "attachment_infos": [{"filename": it["filename"], "sha1": it["sha1"]} for it in items],
+        "plan": _plan_vectors(meta, items, existing, storage),
+    }
+
+
+def _invalidate_caches(post_ids: List[str]) -> None:
+    # The index changed: retire cached search results, and cached rag-api
+    # answers that cited these posts are now stale
+    if not post_ids:
+        return
+    result_cache.bump_generation()
+    try:
+        answer_cache.invalidate_posts(post_ids)
+    except Exception:
+        pass
+
+
+def _ingest_result(prep: Dict[str, Any]) -> Dict[str, Any]:
+    plan = prep["plan"]
+    return {
+        "post_id": prep["meta"]["post_id"],
+        "title": prep["meta"]["title"],
+        "attachments": len(prep["attachment_infos"]),
+        "chunks": plan["chunks"],
+        "embedded": plan["embedded"],
+        "parse_failed": plan["failed"],
         "indexed": True,
-        "attachments_meta": attachment_infos,
+        "attachments_meta": prep["attachment_infos"],
+    }
+
+
+def run_ingest(event: Dict[str, Any]) -> Dict[str, Any]:
+    """Process a single webhook event and index content.
+
+    Expected minimal event fields:
+    - post_id: int or str
+    - title: str
+    - body: str (optional)
+    - tags, category, filetype, date: optional metadata
+    - attachments: [{filename, url, sha1?}] (optional)
+    """
+    # Allow delete action
+    action = str(event.get("action", "")).lower()
+    if action == "post_deleted":
+        return run_delete(event)
+
+    settings = get_settings()
+    storage = settings.get("STORAGE_DIR", "/data/storage")
+    sqlite_path = settings.get("SQLITE_PATH", "/data/sqlite/ir.db")
+
+    # 1) Download + parse attachments (unchanged ones are skipped on update)
+    prep = _prepare_post(event, storage, update=action == "post_updated")
+
+    # 2) Qdrant: 첨부파일만 벡터 인덱싱 (게시글 본문 제외), changed chunks only
+    _apply_vector_plans([prep["plan"]])
+
+    # 3) SQLite FTS: 게시글 본문만 인덱싱 (첨부파일 제외)
+    # FTS row, row map, meta and attachments are written in one transaction
+    with sqlite_session(sqlite_path).transaction() as fts:
+        if prep["update"]:
+            fts.delete_post(post_id=prep["meta"]["post_id"])
+        _index_fts(fts, prep["meta"], prep["attachment_infos"])
+    _index_opensearch(prep["meta"])
+    _invalidate_caches([prep["meta"]["post_id"]])
+
+    return _ingest_result(prep)
+
+
+def run_ingest_batch(events: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Process many webhook events with batched embedding and indexing.
+
+    Events are grouped by post_id (the last event for a post wins; earlier ones
+    are reported as superseded). Chunks of all posts are streamed from the parsers
+    and embedded together in slices of INGEST_EMBED_BATCH (each slice upserted to Qdrant as it is ready)
+    and written to SQLite in one transaction. Returns per-event results in input order.
+    """
+    settings = get_settings()
+    storage = settings.get("STORAGE_DIR", "/data/storage")
+    sqlite_path = settings.get("SQLITE_PATH", "/data/sqlite/ir.db")
+
+    results: List[Optional[Dict[str, Any]]] = [None] * len(events)
+    latest: Dict[str, int] = {}
+    for i, event in enumerate(events):
+        latest[str(event.get("post_id", "unknown"))] = i
+    for i, event in enumerate(events):
+        post_id = str(event.get("post_id", "unknown"))
+        if latest[post_id] != i:
+            results[i] = {"status": "skipped", "post_id": post_id, "message": "superseded by a later event"}
+
+    # 1) Deletes + download/parse per post
+    prepared: List[Tuple[int, Dict[str, Any]]] = []
+    for i in sorted(latest.values()):
+        event = events[i]
+        action = str(event.get("action", "")).lower()
+        try:
+            if action == "post_deleted":
+                results[i] = run_delete(event)
+                continue
+            prepared.append((i, _prepare_post(event, storage, update=action == "post_updated")))
+        except Exception as e:
+            results[i] = {"status": "error", "post_id": str(event.get("post_id", "")), "message": str(e)}
+
+    # 2) Stream changed chunks of all posts through the embedder in bounded batches, upserting as they are ready
+    plans = [prep["plan"] for _i, prep in prepared]
+    try:
+        _apply_vector_plans(plans)
+    except Exception as e:
+        # Posts whose vectors could not all be written are reported and not indexed in FTS
+        for i, prep in prepared:
+            if not prep["plan"]["applied"]:
+                results[i] = {"status": "error", "post_id": prep["meta"]["post_id"], "message": str(e)}
+        prepared = [(i, prep) for i, prep in prepared if prep["plan"]["applied"]]
+
+    # 3) SQLite FTS/meta in one transaction, then optional OpenSearch
+    if prepared:
+        with sqlite_session(sqlite_path).transaction() as fts:
+            for _i, prep in prepared:
+                if prep["update"]:
+                    fts.delete_post(post_id=prep["meta"]["post_id"])
+                _index_fts(fts, prep["meta"], prep["attachment_infos"])
+        for i, prep in prepared:
+            _index_opensearch(prep["meta"])
+            results[i] = {"status": "done", **_ingest_result(prep)}
+        _invalidate_caches([prep["meta"]["post_id"] for _i, prep in prepared])
+
+    done = [r for r in results if r is not None]
+    return {
+        "posts": len(latest),
+        "chunks": sum(prep["plan"]["chunks"] for _i, prep in prepared),
+        "embedded": sum(plan["embedded"] for plan in plans),
+        "done": sum(1 for r in done if r.get("status") in ("done", "deleted")),
+        "errors": sum(1 for r in done if r.get("status") == "error"),
+        "results": done,
     }
 
 
@@ -201,4 +546,5 @@ def run_delete(event: Dict[str, Any]) -> Dict[str, Any]:
             os_delete_post(post_id, index=_os.getenv("OPENSEARCH_INDEX", "posts"))  # type: ignore
         except Exception:
             pass
+    _invalidate_caches([post_id])
     return {"status": "deleted", "post_id": post_id}
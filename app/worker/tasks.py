@@ -1,7 +1,7 @@
-from typing import Dict, Any
+from typing import Dict, Any, List
 
 from .celery_app import app
-from .pipeline import run_ingest
+from .pipeline import run_ingest, run_ingest_batch
 
 
 @app.task(name="app.worker.tasks.ingest_from_webhook")
@@ -12,3 +12,13 @@ def ingest_from_webhook(event: Dict[str, Any]) -> Dict[str, Any]:
         return {"status": "done", **result}
     except Exception as e:  # pragma: no cover
         return {"status": "error", "message": str(e)}
+
+
+@app.task(name="app.worker.tasks.ingest_batch")
+def ingest_batch(events: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Execute the batched ETL pipeline for many webhook events."""
+    try:
+        result = run_ingest_batch(events)
+        return {"status": "done", **result}
+    except Exception as e:  # pragma: no cover
+        return {"status": "error", "message": str(e)}